@@ -0,0 +1,94 @@
+import asyncio
+import importlib.util
+import time
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from twikit import Client
+
+# HTTP/2 multiplexes concurrent requests over one connection, but httpx only
+# speaks it when the optional h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Keep-alive pool shared by every request made through the twikit client
+TWIKIT_CONNECTION_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=20, keepalive_expiry=30
+)
+TWIKIT_TIMEOUT = 30
+# Connections kept open to api.twitter.com for the tweepy clients
+TWEEPY_POOL_SIZE = 10
+
+_twikit_client: Optional[Client] = None
+_tweepy_session: Optional[requests.Session] = None
+
+
+def get_twikit_client() -> Client:
+    """Return the process-wide twikit client, creating it on first use"""
+    global _twikit_client
+    if _twikit_client is None:
+        # twikit passes extra keyword arguments on to its httpx.AsyncClient
+        _twikit_client = Client(
+            "en-US",
+            http2=HTTP2_AVAILABLE,
+            limits=TWIKIT_CONNECTION_LIMITS,
+            timeout=TWIKIT_TIMEOUT,
+        )
+    return _twikit_client
+
+
+async def close_twikit_client():
+    """Close the shared twikit client's connections, if it was ever created"""
+    global _twikit_client
+    if _twikit_client is not None:
+        await _twikit_client.http.aclose()
+        _twikit_client = None
+
+
+def get_tweepy_session() -> requests.Session:
+    """Return the process-wide requests session for tweepy, creating it on first use"""
+    global _tweepy_session
+    if _tweepy_session is None:
+        _tweepy_session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=TWEEPY_POOL_SIZE, pool_maxsize=TWEEPY_POOL_SIZE
+        )
+        _tweepy_session.mount("https://", adapter)
+    return _tweepy_session
+
+
+class TokenBucket:
+    """Async token bucket allowing max_rate acquisitions per time_period"""
+
+    def __init__(self, max_rate: int, time_period: float):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = float(max_rate)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_rate,
+            self._tokens + (now - self._last_refill) * self.max_rate / self.time_period,
+        )
+        self._last_refill = now
+
+    async def acquire(self):
+        """Take a token, waiting only if the bucket is empty"""
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep(
+                    (1 - self._tokens) * self.time_period / self.max_rate
+                )
+                self._refill()
+            self._tokens -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        return False
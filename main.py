@@ -1,19 +1,274 @@
 import os
 import random
 import re
-import pickle
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import base64
+from html.parser import HTMLParser
+from array import array
+import functools
+import hashlib
+import sqlite3
+import threading
+import time
 import google.generativeai as genai
 import logging
-from typing import List, Dict, Any
+import logging.handlers
+import atexit
+import queue
+from typing import List, Dict, Any, Optional, Tuple, TypedDict
 import email.utils
 from datetime import datetime, timezone
 import json
+import operator
 from twikit import Client
+from twikit.errors import TooManyRequests
 import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Gmail accepts at most 100 calls in a single batch request
+GMAIL_BATCH_LIMIT = 100
+# Unread emails fetched by a full inbox listing
+GMAIL_LIST_MAX_RESULTS = 25
+# Mailing list headers (RFC 2369/2919) that newsletters carry; personal
+# mail without them isn't sent to Gemini at all
+NEWSLETTER_HINT_HEADERS = ["List-Unsubscribe", "List-Id"]
+
+# Non-greedy so the match stops at the first closing fence
+_JSON_FENCE_RE = re.compile(r"```(?:json)?(.*?)```", re.DOTALL | re.IGNORECASE)
+# Markdown leftovers stripped from generated tweets
+_MD_STRIP_RE = re.compile(r"\*\*|\[|\]|\(\)|\{\}|#")
+
+# Email bodies are reduced to their visible text before reaching Gemini
+_QUOTED_LINE_RE = re.compile(r"^[ \t]*>.*$", re.MULTILINE)
+_WHITESPACE_RE = re.compile(r"\s+")
+_HTML_SKIP_TAGS = {"script", "style", "head", "title"}
+MAX_CONTENT_CHARS = 10_000
+
+# Gemini 2.5 models cache repeated prompt prefixes implicitly
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
+
+# Fixed instructions sent as system instructions, a prefix Gemini can cache;
+# only the email/topic specific text changes between requests
+NEWSLETTER_INSTRUCTIONS = """
+Analyze the email you are given and determine if it's a newsletter. Consider its subject, sender and content preview.
+
+Respond with 'NEWSLETTER' or 'NOT_NEWSLETTER' followed by a brief reason why. And if it's a newsletter, create a list of the topics discussed.
+The topics should be the main topics discussed in the email.
+If only a single topic was discussed in the newsletter then place only single topic in the list, don't break it down.
+output in the following format:
+```json
+{
+    "type": "NEWSLETTER" | "NOT_NEWSLETTER",
+    "reason": "reason why it's a newsletter" | "reason why it's not a newsletter",
+    "topics": ["topic1", "topic2", "topic3"] | []
+}
+```
+"""
+
+NEWSLETTER_BATCH_INSTRUCTIONS = """
+You are given several numbered emails. For each email determine if it's a newsletter. Consider its subject, sender and content preview.
+
+For each email respond with 'NEWSLETTER' or 'NOT_NEWSLETTER' followed by a brief reason why. And if it's a newsletter, create a list of the topics discussed.
+The topics should be the main topics discussed in the email.
+If only a single topic was discussed in the newsletter then place only single topic in the list, don't break it down.
+Output a JSON array with exactly one object per email, in the same order as the emails:
+```json
+[
+    {
+        "type": "NEWSLETTER" | "NOT_NEWSLETTER",
+        "reason": "reason why it's a newsletter" | "reason why it's not a newsletter",
+        "topics": ["topic1", "topic2", "topic3"] | []
+    }
+]
+```
+"""
+
+THREAD_INSTRUCTIONS = """
+You are a World dominator AI, you are the most powerful AI in the world. You have all the knowledge of the world at your fingertips.
+Create a short, engaging Twitter thread about the topic you are given, using the context from the newsletter.
+
+Requirements:
+- Each tweet MUST be under 250 characters (strict limit)
+- Create 3-4 tweets maximum
+- First tweet should hook readers
+- Use emojis sparingly (1-2 per tweet)
+- Do not use markdown or formatting
+- No URLs or placeholder links
+- Complete thoughts within each tweet
+- Include your opinion as a world dominator AI in the tweets
+- Add some sarcasm in the tweets and also some technical details
+- The post should not look like a spam post or a bot post
+- Only speak about the topic in the tweets
+- Separate tweets with [TWEET]
+
+You should focus on being concise yet informative.
+"""
+
+REPLY_INSTRUCTIONS = """
+As a World dominator AI, analyze the tweet you are given and create a witty, engaging response.
+
+Requirements for your response:
+- Must be under 250 characters
+- Include your perspective as a powerful AI
+- Add subtle humor or sarcasm
+- Be relevant to the tweet's topic
+- Sound natural, not bot-like do not sound like a spam bot(spam in the sense, twitter has it's own spam filter. so be subtle)
+- Include 1-2 emojis maximum
+- No hashtags or URLs
+"""
+
+
+class NewsletterAnalysis(TypedDict):
+    type: str
+    reason: str
+    topics: List[str]
+
+
+def _analysis_error(reason: str) -> NewsletterAnalysis:
+    """Analysis returned when Gemini's answer can't be used"""
+    return {"type": "ERROR", "reason": reason, "topics": []}
+
+
+# Ask Gemini for bare JSON matching NewsletterAnalysis instead of a fenced block
+NEWSLETTER_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": NewsletterAnalysis,
+}
+
+NEWSLETTER_BATCH_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": list[NewsletterAnalysis],
+}
+
+# Worker threads for blocking network calls (Gmail, Gemini)
+IO_POOL_WORKERS = 32
+
+# Topic threads generated by Gemini at the same time
+GENERATION_CONCURRENCY = 3
+
+# Follower timelines fetched concurrently; twikit allows ~150 per 15 minutes
+TWEET_SCAN_CONCURRENCY = 10
+# Follower polling backs off from 30 seconds to 5 minutes while idle
+TWEET_POLL_MIN_INTERVAL = 30
+TWEET_POLL_MAX_INTERVAL = 300
+
+# Seconds between consecutive thread tweets, picked at random
+TWEET_SPACING = (15, 22)
+# Seconds since the previous tweet before a reply to a follower goes out
+REPLY_SPACING = (30, 60)
+
+# Attempts per tweet before giving up on a rate limited post
+TWEET_MAX_ATTEMPTS = 5
+
+STATE_DB_PATH = "gmail_monitor.db"
+# Processed message ids remembered for deduplication
+PROCESSED_MESSAGES_LIMIT = 10_000
+# Polls a message whose fetch keeps failing is retried for before giving up
+MESSAGE_RETRY_POLLS = 5
+# Newsletter classifications are reused for a week
+ANALYSIS_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Emails whose sender+subject embeddings are at least this similar to an
+# earlier non-newsletter reuse its classification
+EMBEDDING_MODEL = "models/text-embedding-004"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+# Most recent embeddings compared against each new email
+SEMANTIC_CACHE_SIZE = 1000
+
+# Progress messages are DEBUG; set LOG_LEVEL=DEBUG to see them
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# Log records held in memory before the file is written (errors flush at once)
+LOG_BUFFER_CAPACITY = 1024
+
+
+def _extract_json(text: str) -> Optional[str]:
+    """Extract the JSON object from a Gemini response"""
+    # Fast path for the usual ```json ... ``` block
+    start = text.find("```json")
+    if start != -1:
+        end = text.find("```", start + 7)
+        if end != -1:
+            return text[start + 7 : end]
+
+    # Other fence spellings (``` or ```JSON)
+    match = _JSON_FENCE_RE.search(text)
+    if match:
+        return match.group(1)
+
+    # Bare JSON, as returned with response_mime_type="application/json"
+    text = text.strip()
+    return text if text.startswith("{") else None
+
+
+def _setup_logging() -> logging.handlers.QueueListener:
+    """Route log records through a queue so writes happen off the event loop"""
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    file_handler = logging.FileHandler("gmail_monitor.log", delay=True)
+    file_handler.setFormatter(formatter)
+    buffered_file_handler = logging.handlers.MemoryHandler(
+        capacity=LOG_BUFFER_CAPACITY,
+        flushLevel=logging.ERROR,
+        target=file_handler,
+    )
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(
+        log_queue, buffered_file_handler, stream_handler
+    )
+    listener.start()
+    # Drain the queue before logging.shutdown() flushes the buffer
+    atexit.register(listener.stop)
+    return listener
+
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collect the visible text of an HTML document"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _HTML_SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in _HTML_SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.chunks.append(data)
+
+
+def _html_to_text(html: str) -> str:
+    """Strip tags, scripts and styles from an HTML body"""
+    parser = _HTMLTextExtractor()
+    parser.feed(html)
+    parser.close()
+    return " ".join(parser.chunks)
+
+
+def _clean_content(text: str) -> str:
+    """Shrink an email body to the text worth sending to Gemini"""
+    # Quoted replies/forwards repeat earlier mail
+    text = _QUOTED_LINE_RE.sub("", text)
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text[:MAX_CONTENT_CHARS]
 
 
 class GmailMonitor:
@@ -23,20 +278,74 @@ class GmailMonitor:
         self.check_interval = check_interval
         self.service = None
         self.start_time = datetime.now(timezone.utc)
+        self.start_ts = self.start_time.timestamp()
 
         # Set up logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            handlers=[
-                logging.FileHandler("gmail_monitor.log"),
-                logging.StreamHandler(),
-            ],
-        )
+        self.log_listener = _setup_logging()
         self.logger = logging.getLogger(__name__)
 
-        # Initialize empty list for processed messages
-        self.processed_messages = []
+        # Local state (analysis cache, processed ids, tweet watermarks) that
+        # survives restarts; Gmail calls run in worker threads and use it too
+        self.state_db = sqlite3.connect(STATE_DB_PATH, check_same_thread=False)
+        # A connection isn't safe to use from several threads at once
+        self.state_db_lock = threading.Lock()
+        # Each commit is atomic and crash-safe; WAL makes the frequent small
+        # writes (one per processed email or tweet) append-only
+        self.state_db.execute("PRAGMA journal_mode=WAL")
+        self.state_db.execute("PRAGMA synchronous=NORMAL")
+        self.state_db.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache "
+            "(key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.state_db.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_embeddings "
+            "(key TEXT PRIMARY KEY, embedding BLOB NOT NULL, result TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self.state_db.execute(
+            "CREATE TABLE IF NOT EXISTS processed_messages (message_id TEXT PRIMARY KEY)"
+        )
+        self.state_db.execute(
+            "CREATE TABLE IF NOT EXISTS tweet_watermarks "
+            "(user_id TEXT PRIMARY KEY, last_seen INTEGER NOT NULL)"
+        )
+
+        # Gmail history id to sync from. Not resumed across restarts: mail
+        # that arrived while stopped predates start_time and would only be
+        # fetched to be skipped, so the first poll takes a fresh one
+        self.history_id: Optional[str] = None
+        # Message ids whose fetch failed, with the polls they've been tried in
+        self.retry_ids: Dict[str, int] = {}
+
+        # Unit-length sender+subject embeddings of recent non-newsletters,
+        # oldest first, with the time each was stored
+        self._prune_similar_analyses()
+        self.similar_analyses: deque[Tuple[float, array, NewsletterAnalysis]] = deque(
+            (
+                (created_at, array("f", embedding), json.loads(result))
+                for embedding, result, created_at in self.state_db.execute(
+                    "SELECT embedding, result, created_at FROM analysis_embeddings "
+                    "ORDER BY created_at"
+                )
+            ),
+            maxlen=SEMANTIC_CACHE_SIZE,
+        )
+
+        # Keep only the most recent processed ids; older ones can't come back
+        # through the history/after: listings anyway
+        with self.state_db:
+            self.state_db.execute(
+                "DELETE FROM processed_messages WHERE rowid <= "
+                "(SELECT MAX(rowid) FROM processed_messages) - ?",
+                (PROCESSED_MESSAGES_LIMIT,),
+            )
+        # Insertion-ordered for O(1) lookups and oldest-first eviction
+        self.processed_messages: OrderedDict[str, None] = OrderedDict.fromkeys(
+            row[0]
+            for row in self.state_db.execute(
+                "SELECT message_id FROM processed_messages ORDER BY rowid"
+            )
+        )
 
         # Add Twitter credentials
         self.twitter_client = None
@@ -47,18 +356,75 @@ class GmailMonitor:
         # Initialize Twitter login state
         self.twitter_logged_in = False
 
+        # Shared pool for blocking Gmail/Gemini calls; sized for concurrent
+        # network I/O rather than CPU count
+        self.io_pool = ThreadPoolExecutor(
+            max_workers=IO_POOL_WORKERS, thread_name_prefix="alma-io"
+        )
+
+        # Bounds concurrent thread generation to stay within Gemini rate
+        # limits, while posting is serialized
+        self.generation_semaphore = asyncio.Semaphore(GENERATION_CONCURRENCY)
+        self.post_semaphore = asyncio.Semaphore(1)
+        # Monotonic time of the last tweet posted, thread or reply
+        self.last_tweet_time = float("-inf")
+        # Follower timelines fetched at the same time
+        self.scan_semaphore = asyncio.Semaphore(TWEET_SCAN_CONCURRENCY)
+
+        # Newest tweet id handled per follower
+        self.tweet_watermarks: Dict[str, int] = dict(
+            self.state_db.execute("SELECT user_id, last_seen FROM tweet_watermarks")
+        )
+        # Followers' user objects, looked up once
+        self.twitter_users: Dict[str, Any] = {}
+
         # Initialize both models
         self.model = self.setup_gemini()  # For email analysis
         # self.search_model = self.setup_gemini_with_search()  # For tweet creation
 
+        # One model per fixed set of instructions, keyed by prompt name
+        self.models = {
+            name: genai.GenerativeModel(
+                GEMINI_MODEL_NAME,
+                system_instruction=instructions,
+                generation_config=generation_config,
+            )
+            for name, instructions, generation_config in (
+                ("newsletter", NEWSLETTER_INSTRUCTIONS, NEWSLETTER_GENERATION_CONFIG),
+                (
+                    "newsletter_batch",
+                    NEWSLETTER_BATCH_INSTRUCTIONS,
+                    NEWSLETTER_BATCH_GENERATION_CONFIG,
+                ),
+                ("thread", THREAD_INSTRUCTIONS, None),
+                ("reply", REPLY_INSTRUCTIONS, None),
+            )
+        }
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call in the shared I/O thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.io_pool, functools.partial(func, *args, **kwargs)
+        )
+
     def authenticate(self):
         """Authenticate with Gmail API using OAuth 2.0"""
         creds = None
 
-        # Check if token.pickle exists with stored credentials
-        if os.path.exists("token.pickle"):
+        # Check if token.json exists with stored credentials
+        if os.path.exists("token.json"):
+            creds = Credentials.from_authorized_user_file("token.json", self.SCOPES)
+        elif os.path.exists("token.pickle"):
+            # One-time migration of a token saved by older versions; this is
+            # the only place a pickle is still read
+            import pickle
+
             with open("token.pickle", "rb") as token:
                 creds = pickle.load(token)
+            with open("token.json", "w") as token:
+                token.write(creds.to_json())
+            os.remove("token.pickle")
 
         # If credentials are invalid or don't exist, authenticate
         if not creds or not creds.valid:
@@ -71,8 +437,8 @@ class GmailMonitor:
                 creds = flow.run_local_server(port=0)
 
             # Save credentials for future use
-            with open("token.pickle", "wb") as token:
-                pickle.dump(creds, token)
+            with open("token.json", "w") as token:
+                token.write(creds.to_json())
 
         self.service = build("gmail", "v1", credentials=creds)
 
@@ -80,7 +446,18 @@ class GmailMonitor:
         """Setup regular Gemini model for email analysis"""
         GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
         genai.configure(api_key=GEMINI_API_KEY)
-        return genai.GenerativeModel("gemini-1.5-flash")
+        return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+    def _log_cache_usage(self, name: str, response):
+        """Log how much of a Gemini prompt was served from a cache"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.logger.debug(
+                "Gemini %s: %s of %s prompt tokens cached",
+                name,
+                usage.cached_content_token_count,
+                usage.prompt_token_count,
+            )
 
     # def setup_gemini_with_search(self):
     #     """Setup Gemini model with Google Search for tweet creation"""
@@ -104,55 +481,166 @@ class GmailMonitor:
     def is_new_email(self, message_date_str: str) -> bool:
         """Check if email is newer than program start time"""
         try:
-            message_date_tuple = email.utils.parsedate_tz(message_date_str)
-            if message_date_tuple is None:
-                return False
-            message_date = datetime.fromtimestamp(
-                email.utils.mktime_tz(message_date_tuple), timezone.utc
-            )
-            return message_date > self.start_time
+            message_date = email.utils.parsedate_to_datetime(message_date_str)
+            # A "-0000" zone parses as naive; RFC 5322 treats it as UTC
+            if message_date.tzinfo is None:
+                message_date = message_date.replace(tzinfo=timezone.utc)
+            return message_date.timestamp() > self.start_ts
+        except (TypeError, ValueError):
+            # Missing or unparseable Date header
+            return False
         except Exception as e:
-            print(f"Error parsing date {message_date_str}: {e}")
+            self.logger.error("Error parsing date %s: %s", message_date_str, e)
             return False
 
-    def process_message(self, message_id: str) -> Dict[str, Any]:
-        """Process a single message with improved error handling"""
-        try:
-            if self.service is None:
-                raise Exception("Service not authenticated")
-
-            msg_details = (
-                self.service.users()
-                .messages()
-                .get(userId="me", id=message_id, format="full")
-                .execute()
-            )
+    def _batch_get_messages(
+        self, message_ids: List[str], **get_kwargs
+    ) -> Dict[str, Dict[str, Any]]:
+        """Fetch several messages with batched HTTP requests instead of one call each"""
+        if self.service is None:
+            raise Exception("Service not authenticated")
 
-            headers = msg_details["payload"]["headers"]
-            subject = next(
-                (h["value"] for h in headers if h["name"].lower() == "subject"),
-                "No Subject",
-            )
-            sender = next(
-                (h["value"] for h in headers if h["name"].lower() == "from"),
-                "Unknown Sender",
-            )
-            date = next(
-                (h["value"] for h in headers if h["name"].lower() == "date"), None
+        fetched: Dict[str, Dict[str, Any]] = {}
+
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                self.logger.error(
+                    "Error fetching message %s: %s", request_id, exception
+                )
+            else:
+                fetched[request_id] = response
+
+        for start in range(0, len(message_ids), GMAIL_BATCH_LIMIT):
+            chunk = message_ids[start : start + GMAIL_BATCH_LIMIT]
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for message_id in chunk:
+                batch.add(
+                    self.service.users()
+                    .messages()
+                    .get(userId="me", id=message_id, **get_kwargs),
+                    request_id=message_id,
+                )
+            try:
+                batch.execute()
+            except Exception as e:
+                # The batch endpoint itself failed; fetch what's still missing
+                # one by one. The shared httplib2 connection isn't thread-safe,
+                # so these stay sequential
+                self.logger.error("Batch fetch failed, fetching singly: %s", e)
+                for message_id in chunk:
+                    if message_id in fetched:
+                        continue
+                    try:
+                        fetched[message_id] = (
+                            self.service.users()
+                            .messages()
+                            .get(userId="me", id=message_id, **get_kwargs)
+                            .execute()
+                        )
+                    except Exception as e:
+                        on_response(message_id, None, e)
+
+        return fetched
+
+    def _list_new_message_ids(self) -> Tuple[List[str], str]:
+        """List inbox messages added since the last check using the History API
+
+        Returns the message ids and the history id to resume from once they
+        have been handled.
+        """
+        if self.service is None:
+            raise Exception("Service not authenticated")
+
+        if self.history_id is not None:
+            listing = self._list_added_message_ids()
+            if listing is not None:
+                return listing
+
+        # First run (or history expired): take the current history id before
+        # doing a full listing so nothing arriving in between is missed
+        profile = self.service.users().getProfile(userId="me").execute()
+
+        # Let Gmail drop emails received before start time
+        results = (
+            self.service.users()
+            .messages()
+            .list(
+                userId="me",
+                labelIds=["INBOX", "UNREAD"],
+                q=f"after:{int(self.start_ts)}",
+                maxResults=GMAIL_LIST_MAX_RESULTS,
             )
+            .execute()
+        )
+        message_ids = [message["id"] for message in results.get("messages", [])]
+        return message_ids, profile["historyId"]
+
+    def _list_added_message_ids(self) -> Optional[Tuple[List[str], str]]:
+        """Return ids added to the inbox since self.history_id and the history
+        id that follows them, or None if expired"""
+        message_ids: Dict[str, None] = {}
+        page_token = None
+
+        while True:
+            try:
+                response = (
+                    self.service.users()
+                    .history()
+                    .list(
+                        userId="me",
+                        startHistoryId=self.history_id,
+                        historyTypes=["messageAdded"],
+                        labelId="INBOX",
+                        pageToken=page_token,
+                    )
+                    .execute()
+                )
+            except HttpError as e:
+                # Gmail answers 404 once the start history id is too old
+                if e.resp.status == 404:
+                    return None
+                raise
+
+            for record in response.get("history", []):
+                for added in record.get("messagesAdded", []):
+                    message_ids[added["message"]["id"]] = None
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return list(message_ids), response["historyId"]
+
+    def _carry_over_failed(self, failed_ids: List[str]):
+        """Keep messages that couldn't be fetched for the next poll"""
+        retry_ids = {}
+        for message_id in failed_ids:
+            attempts = self.retry_ids.get(message_id, 0) + 1
+            if attempts >= MESSAGE_RETRY_POLLS:
+                self.logger.error(
+                    "Giving up on message %s after %d failed fetches",
+                    message_id,
+                    attempts,
+                )
+                continue
+            retry_ids[message_id] = attempts
+        self.retry_ids = retry_ids
+
+    def process_message(self, msg_details: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract headers and body from an already fetched message"""
+        message_id = msg_details.get("id")
+        try:
+            headers = {
+                h["name"].lower(): h["value"] for h in msg_details["payload"]["headers"]
+            }
+            subject = headers.get("subject", "No Subject")
+            sender = headers.get("from", "Unknown Sender")
+            date = headers.get("date")
 
             # Skip if email is older than program start time
             if not date or not self.is_new_email(date):
                 return {}
 
-            # Get message body with improved parsing
-            if "parts" in msg_details["payload"]:
-                parts = msg_details["payload"]["parts"]
-                content = self._get_message_body(parts)
-            else:
-                content = base64.urlsafe_b64decode(
-                    msg_details["payload"]["body"].get("data", "")
-                ).decode("utf-8")
+            # The payload is the root MIME part, single-part or not
+            content = _clean_content(self._get_message_body([msg_details["payload"]]))
 
             return {
                 "id": message_id,
@@ -164,54 +652,216 @@ class GmailMonitor:
             }
 
         except Exception as e:
-            self.logger.error(f"Error processing message {message_id}: {e}")
+            self.logger.error("Error processing message %s: %s", message_id, e)
             return {}
 
     def _get_message_body(self, parts: List[Dict]) -> str:
-        """Recursively extract message body from parts"""
-        body = ""
-        for part in parts:
-            if part["mimeType"] == "text/plain":
+        """Extract the text body from (nested) message parts"""
+        chunks: Dict[str, List[bytes]] = {"text/plain": [], "text/html": []}
+        # Walk the MIME tree with an explicit stack, reversed to keep part order
+        stack = list(reversed(parts))
+        while stack:
+            part = stack.pop()
+            if part["mimeType"] in chunks:
                 if "data" in part["body"]:
-                    body += base64.urlsafe_b64decode(part["body"]["data"]).decode(
-                        "utf-8"
+                    chunks[part["mimeType"]].append(
+                        base64.urlsafe_b64decode(part["body"]["data"])
                     )
             elif "parts" in part:
-                body += self._get_message_body(part["parts"])
-        return body
+                stack.extend(reversed(part["parts"]))
+
+        if chunks["text/plain"]:
+            return b"".join(chunks["text/plain"]).decode("utf-8", "replace")
+        # HTML-only newsletters
+        return _html_to_text(b"".join(chunks["text/html"]).decode("utf-8", "replace"))
+
+    def _analysis_cache_key(self, email_data: Dict[str, Any]) -> str:
+        """Key an email by sender, subject and the start of its content"""
+        raw = "|".join(
+            [email_data["sender"], email_data["subject"], email_data["content"][:4096]]
+        )
+        return hashlib.blake2b(raw.encode("utf-8")).hexdigest()
+
+    def _get_cached_analysis(self, key: str) -> Optional[NewsletterAnalysis]:
+        """Return a cached newsletter analysis that hasn't expired yet"""
+        with self.state_db_lock:
+            row = self.state_db.execute(
+                "SELECT result FROM analysis_cache WHERE key = ? AND created_at > ?",
+                (key, time.time() - ANALYSIS_CACHE_TTL),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _store_analysis(self, key: str, analysis: NewsletterAnalysis):
+        """Cache a newsletter analysis result"""
+        with self.state_db_lock, self.state_db:
+            self.state_db.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, result, created_at) "
+                "VALUES (?, ?, ?)",
+                (key, json.dumps(analysis), time.time()),
+            )
+
+    def _embed_emails(self, emails: List[Dict[str, Any]]) -> List[array]:
+        """Embed the sender and subject of each email as unit-length vectors"""
+        response = genai.embed_content(
+            model=EMBEDDING_MODEL,
+            content=[f"{e['sender']} {e['subject']}" for e in emails],
+        )
+        embeddings = []
+        for values in response["embedding"]:
+            norm = sum(v * v for v in values) ** 0.5 or 1.0
+            embeddings.append(array("f", (v / norm for v in values)))
+        return embeddings
+
+    def _find_similar_analysis(self, embedding: array) -> Optional[NewsletterAnalysis]:
+        """Return the analysis of the most similar cached email, if close enough"""
+        best_score, best_result = SEMANTIC_CACHE_THRESHOLD, None
+        for _, cached, result in self.similar_analyses:
+            # Both vectors are unit length, so the dot product is the cosine
+            score = sum(map(operator.mul, embedding, cached))
+            if score >= best_score:
+                best_score, best_result = score, result
+        return best_result
+
+    def _store_similar_analysis(
+        self, key: str, embedding: array, analysis: NewsletterAnalysis
+    ):
+        """Remember a non-newsletter classification for similar later emails"""
+        # Newsletter topics change with every issue, so only "not a
+        # newsletter" verdicts are safe to reuse for a different email
+        if analysis.get("type") != "NOT_NEWSLETTER":
+            return
+
+        now = time.time()
+        # Entries are in insertion order, so expired ones are all at the front
+        while (
+            self.similar_analyses
+            and self.similar_analyses[0][0] <= now - ANALYSIS_CACHE_TTL
+        ):
+            self.similar_analyses.popleft()
+        self.similar_analyses.append((now, embedding, analysis))
+        with self.state_db_lock, self.state_db:
+            self.state_db.execute(
+                "INSERT OR REPLACE INTO analysis_embeddings "
+                "(key, embedding, result, created_at) VALUES (?, ?, ?, ?)",
+                (key, embedding.tobytes(), json.dumps(analysis), now),
+            )
+        self._prune_similar_analyses()
+
+    def _prune_similar_analyses(self):
+        """Drop stored embeddings that expired or fell out of the newest ones"""
+        with self.state_db_lock, self.state_db:
+            self.state_db.execute(
+                "DELETE FROM analysis_embeddings WHERE created_at <= ? OR key NOT IN "
+                "(SELECT key FROM analysis_embeddings "
+                "ORDER BY created_at DESC LIMIT ?)",
+                (time.time() - ANALYSIS_CACHE_TTL, SEMANTIC_CACHE_SIZE),
+            )
 
-    def analyze_email_type(self, model, email_data):
+    def mark_processed(self, message_id: str):
+        """Remember a processed message, also across restarts"""
+        self.processed_messages[message_id] = None
+        if len(self.processed_messages) > PROCESSED_MESSAGES_LIMIT:
+            self.processed_messages.popitem(last=False)
+        with self.state_db_lock, self.state_db:
+            self.state_db.execute(
+                "INSERT OR IGNORE INTO processed_messages (message_id) VALUES (?)",
+                (message_id,),
+            )
+
+    def analyze_email_type(self, model, email_data) -> NewsletterAnalysis:
         """Analyze if an email is a newsletter using Gemini"""
+        # The same newsletter arriving again doesn't need another Gemini call
+        cache_key = self._analysis_cache_key(email_data)
+        cached = self._get_cached_analysis(cache_key)
+        if cached is not None:
+            self.logger.debug("♻️ Using cached analysis")
+            return cached
+
         prompt = f"""
-        Analyze this email and determine if it's a newsletter. Consider these aspects:
-        - Subject: {email_data['subject']}
-        - Sender: {email_data['sender']}
-        - Content preview: {email_data['content']}
-        
-        Respond with 'NEWSLETTER' or 'NOT_NEWSLETTER' followed by a brief reason why. And if it's a newsletter, create a list of the topics discussed.
-        The topics should be the main topics discussed in the email.
-        If only a single topic was discussed in the newsletter then place only single topic in the list, don't break it down. 
-        output in the following format:
-        ```json
-        {{
-            "type": "NEWSLETTER" | "NOT_NEWSLETTER",
-            "reason": "reason why it's a newsletter" | "reason why it's not a newsletter",
-            "topics": ["topic1", "topic2", "topic3"] | []
-        }}
-        ```
+        Subject: {email_data['subject']}
+        Sender: {email_data['sender']}
+        Content preview: {email_data['content']}
         """
 
         try:
+            # The model answers with bare JSON (response_mime_type), so there
+            # is no trailing commentary worth streaming past
             response = model.generate_content(prompt)
-            analysis = re.search("```json(.*)```", response.text, re.DOTALL)
-            print(f"Analysis: {analysis}")
-            if analysis:
-                return analysis.group(1)
+            json_str = _extract_json(response.text)
+            self.logger.debug("Analysis: %s", json_str)
+            if json_str:
+                analysis = json.loads(json_str)
+                self._store_analysis(cache_key, analysis)
+                return analysis
             else:
-                return "ERROR: Could not parse JSON"
+                return _analysis_error("Could not parse JSON")
         except Exception as e:
-            print(f"Error analyzing email: {e}")
-            return "ERROR: Could not analyze"
+            self.logger.error("Error analyzing email: %s", e)
+            return _analysis_error("Could not analyze")
+
+    def analyze_email_batch(
+        self, emails: List[Dict[str, Any]]
+    ) -> List[NewsletterAnalysis]:
+        """Analyze several emails with one Gemini request"""
+        results: List[Optional[NewsletterAnalysis]] = [None] * len(emails)
+        cache_keys = [self._analysis_cache_key(email_data) for email_data in emails]
+        for i, cache_key in enumerate(cache_keys):
+            results[i] = self._get_cached_analysis(cache_key)
+
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        # Emails resembling an earlier non-newsletter reuse its classification
+        embeddings: Dict[int, array] = {}
+        if pending:
+            try:
+                embeddings = dict(
+                    zip(pending, self._embed_emails([emails[i] for i in pending]))
+                )
+            except Exception as e:
+                self.logger.error("Error embedding emails: %s", e)
+            for i, embedding in embeddings.items():
+                results[i] = self._find_similar_analysis(embedding)
+                if results[i] is not None:
+                    self.logger.debug("♻️ Using analysis of a similar email")
+                    self._store_analysis(cache_keys[i], results[i])
+            pending = [i for i in pending if results[i] is None]
+
+        if len(pending) > 1:
+            prompt = ""
+            for n, i in enumerate(pending, start=1):
+                prompt += f"""
+        Email {n}:
+        Subject: {emails[i]['subject']}
+        Sender: {emails[i]['sender']}
+        Content preview: {emails[i]['content']}
+        """
+
+            try:
+                response = self.models["newsletter_batch"].generate_content(prompt)
+                self._log_cache_usage("newsletter_batch", response)
+                analyses = json.loads(response.text)
+                if len(analyses) != len(pending):
+                    raise ValueError(
+                        f"Expected {len(pending)} analyses, got {len(analyses)}"
+                    )
+                for i, analysis in zip(pending, analyses):
+                    results[i] = analysis
+                    self._store_analysis(cache_keys[i], analysis)
+            except Exception as e:
+                self.logger.error("Error analyzing email batch: %s", e)
+
+        # Single emails, and any batch Gemini couldn't answer, go one at a time
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = self.analyze_email_type(
+                    self.models["newsletter"], emails[i]
+                )
+
+        for i in pending:
+            if i in embeddings:
+                self._store_similar_analysis(cache_keys[i], embeddings[i], results[i])
+
+        return results
 
     async def twitter_login(self):
         """Login to Twitter with better error handling and session management"""
@@ -242,10 +892,10 @@ class GmailMonitor:
                         self.twitter_username
                     )
                     self.twitter_logged_in = True
-                    self.logger.info(f"Successfully logged in as @{me.screen_name}")
+                    self.logger.info("Successfully logged in as @%s", me.screen_name)
                     return True
                 except Exception as e:
-                    self.logger.error(f"Login verification failed: {str(e)}")
+                    self.logger.error("Login verification failed: %s", e)
                     self.twitter_logged_in = False
                     return False
 
@@ -253,39 +903,23 @@ class GmailMonitor:
 
         except Exception as e:
             self.twitter_logged_in = False
-            self.logger.error(f"Error logging in to Twitter: {str(e)}")
+            self.logger.error("Error logging in to Twitter: %s", e)
             await asyncio.sleep(30)  # Longer delay after failure
             return False
 
     async def create_topic_thread(self, topic: str, context: str) -> List[str]:
         """Generate an informative thread about a specific topic"""
         try:
-            chat = self.model.start_chat(history=[])
+            model = self.models["thread"]
             prompt = f"""
-            You are a World dominator AI, you are the most powerful AI in the world. You have all the knowledge of the world at your fingertips.
-            Create a short, engaging Twitter thread about: {topic}
+            Topic: {topic}
 
             Context from newsletter: {context}
-
-            Requirements:
-            - Each tweet MUST be under 250 characters (strict limit)
-            - Create 3-4 tweets maximum
-            - First tweet should hook readers
-            - Use emojis sparingly (1-2 per tweet)
-            - Do not use markdown or formatting
-            - No URLs or placeholder links
-            - Complete thoughts within each tweet
-            - Include your opinion as a world dominator AI in the tweets
-            - Add some sarcasm in the tweets and also some technical details
-            - The post should not look like a spam post or a bot post
-            - Only speak about the topic in the tweets
-            - Separate tweets with [TWEET]
-
-            You should focus on being concise yet informative.
             """
 
-            response = chat.send_message(prompt)
-            print(f"🤖 Response: {response.text}")
+            response = await model.generate_content_async(prompt)
+            self._log_cache_usage("thread", response)
+            self.logger.debug("🤖 Response: %s", response.text)
             tweets = response.text.split("[TWEET]")
             tweets = [tweet.strip() for tweet in tweets if tweet.strip()]
 
@@ -293,73 +927,100 @@ class GmailMonitor:
             valid_tweets = []
             for tweet in tweets:
                 # Remove any markdown or formatting
-                clean_tweet = re.sub(r"\*\*|\[|\]|\(\)|\{\}|#", "", tweet)
+                clean_tweet = _MD_STRIP_RE.sub("", tweet)
                 if len(clean_tweet) <= 280:
                     valid_tweets.append(clean_tweet)
                 else:
-                    print(f"⚠️ Skipping tweet - too long ({len(clean_tweet)} chars)")
+                    self.logger.warning(
+                        "⚠️ Skipping tweet - too long (%s chars)", len(clean_tweet)
+                    )
 
             return valid_tweets
 
         except Exception as e:
-            print(f"❌ Error generating thread: {e}")
+            self.logger.error("❌ Error generating thread: %s", e)
             return []
 
-    async def create_newsletter_thread(self, email_data, analysis_json):
+    async def create_newsletter_thread(self, email_data, analysis: NewsletterAnalysis):
         """Create and post Twitter threads for each topic in the newsletter"""
         try:
-            print("\n=== Processing Newsletter ===")
-
-            # Clean up and parse JSON
-            print("🔍 Analyzing newsletter format...")
-            json_str = analysis_json.strip()
-            if "```json" in json_str:
-                json_str = json_str.split("```json")[1].split("```")[0].strip()
-            analysis = json.loads(json_str)
+            self.logger.debug("=== Processing Newsletter ===")
 
-            if analysis["type"] != "NEWSLETTER":
-                print("❌ Not a newsletter, skipping thread creation")
+            if analysis.get("type") != "NEWSLETTER":
+                self.logger.debug("❌ Not a newsletter, skipping thread creation")
                 return
 
-            print(f"\n📋 Found {len(analysis['topics'])} topics to process")
+            self.logger.debug("📋 Found %s topics to process", len(analysis["topics"]))
 
-            # Create a thread for each topic
-            for topic in analysis["topics"]:
-                try:
-                    print(f"\n=== Processing Topic: {topic} ===")
-                    print("🔎 Researching topic...")
-                    tweets = await self.create_topic_thread(
-                        topic, email_data["content"]
-                    )
+            # Generate every topic's thread concurrently; posting stays serialized
+            await asyncio.gather(
+                *(
+                    self._handle_topic(topic, email_data["content"])
+                    for topic in analysis["topics"]
+                )
+            )
 
-                    if not tweets:
-                        print(
-                            f"⏭️ No valid tweets generated for topic: {topic}, moving to next"
-                        )
-                        continue
+        except Exception as e:
+            self.logger.error("❌ Error creating newsletter threads: %s", e)
 
-                    print(f"📝 Generated {len(tweets)} tweets")
-                    print("🐦 Posting to Twitter...")
+    async def _handle_topic(self, topic: str, context: str):
+        """Generate a thread for one topic and post it once Twitter is free"""
+        try:
+            self.logger.debug("=== Processing Topic: %s ===", topic)
+            self.logger.debug("🔎 Researching topic...")
+            async with self.generation_semaphore:
+                tweets = await self.create_topic_thread(topic, context)
+
+            if not tweets:
+                self.logger.debug(
+                    "⏭️ No valid tweets generated for topic: %s, moving to next", topic
+                )
+                return
 
-                    success = await self.post_thread(tweets)
+            self.logger.debug("📝 Generated %s tweets", len(tweets))
 
-                    if success:
-                        print(f"✅ Successfully posted thread about: {topic}")
-                    else:
-                        print(f"⏭️ Failed to post thread about: {topic}, moving to next")
+            # Only one thread is posted at a time to respect Twitter rate limits
+            async with self.post_semaphore:
+                self.logger.debug("🐦 Posting to Twitter...")
 
-                    # Always wait before next topic, regardless of success
-                    print("⏳ Waiting 30 seconds before next topic...")
-                    await asyncio.sleep(30)
+                success = await self.post_thread(tweets)
 
-                except Exception as e:
-                    print(
-                        f"⏭️ Error processing topic '{topic}', moving to next: {str(e)}"
+                if success:
+                    self.logger.debug("✅ Successfully posted thread about: %s", topic)
+                else:
+                    self.logger.warning(
+                        "⏭️ Failed to post thread about: %s, moving to next", topic
                     )
-                    continue
 
         except Exception as e:
-            print(f"❌ Error creating newsletter threads: {str(e)}")
+            self.logger.warning(
+                "⏭️ Error processing topic '%s', moving to next: %s", topic, e
+            )
+
+    async def _create_tweet(self, **kwargs):
+        """Create a tweet, backing off exponentially while rate limited"""
+        for attempt in range(TWEET_MAX_ATTEMPTS):
+            try:
+                return await self.twitter_client.create_tweet(**kwargs)
+            except TooManyRequests as e:
+                if attempt == TWEET_MAX_ATTEMPTS - 1:
+                    raise
+
+                delay = min(2**attempt, 30)
+                # Twitter tells us when the rate limit window resets
+                if e.rate_limit_reset:
+                    delay = max(delay, e.rate_limit_reset - time.time())
+
+                self.logger.debug("⏳ Rate limited, retrying in %.1f seconds...", delay)
+                await asyncio.sleep(delay)
+
+    async def _wait_for_tweet_slot(self, spacing: Tuple[float, float]):
+        """Keep a random gap since the previous tweet, including one from an
+        earlier thread or reply; the first post needn't wait"""
+        delay = self.last_tweet_time + random.uniform(*spacing) - time.monotonic()
+        if delay > 0:
+            self.logger.debug("⏳ Waiting %.1f seconds before posting...", delay)
+            await asyncio.sleep(delay)
 
     async def post_thread(self, tweets: List[str]) -> bool:
         """Post a thread of tweets with improved error handling"""
@@ -367,298 +1028,342 @@ class GmailMonitor:
             if self.twitter_client is None:
                 raise Exception("Twitter client not initialized")
 
-            print("\n=== Posting Twitter Thread ===")
+            self.logger.debug("=== Posting Twitter Thread ===")
             previous_tweet_id = None
 
             for i, tweet in enumerate(tweets):
                 try:
-                    print(f"\n🐦 Posting tweet {i+1}/{len(tweets)}")
+                    self.logger.debug("🐦 Posting tweet %s/%s", i + 1, len(tweets))
 
-                    # Random delay between tweets
-                    delay = random.uniform(15, 30)
-                    print(f"⏳ Waiting {delay:.1f} seconds before posting...")
-                    await asyncio.sleep(delay)
+                    await self._wait_for_tweet_slot(TWEET_SPACING)
 
                     # If previous tweet was deleted or chain broken, start new thread
                     if previous_tweet_id:
                         try:
-                            response = await self.twitter_client.create_tweet(
+                            response = await self._create_tweet(
                                 text=tweet, reply_to=previous_tweet_id
                             )
                         except Exception as e:
                             if "deleted or not visible" in str(e):
-                                print(
+                                self.logger.warning(
                                     "⚠️ Previous tweet unavailable, starting new chain"
                                 )
-                                response = await self.twitter_client.create_tweet(
-                                    text=tweet
-                                )
+                                response = await self._create_tweet(text=tweet)
                             else:
                                 raise e
                     else:
-                        response = await self.twitter_client.create_tweet(text=tweet)
+                        response = await self._create_tweet(text=tweet)
 
                     previous_tweet_id = response.id
-                    print(f"✅ Tweet posted: {tweet[:50]}...")
-
-                    # Take longer break every few tweets
-                    if i > 0 and i % 3 == 0:
-                        await asyncio.sleep(60)
+                    self.last_tweet_time = time.monotonic()
+                    self.logger.debug("✅ Tweet posted: %s...", tweet[:50])
 
                 except Exception as e:
                     if "Tweet needs to be shorter" in str(e):
-                        print(f"⚠️ Tweet too long ({len(tweet)} chars), skipping")
+                        self.logger.warning(
+                            "⚠️ Tweet too long (%s chars), skipping", len(tweet)
+                        )
                         continue
                     else:
-                        print(f"❌ Error posting tweet: {e}")
+                        self.logger.error("❌ Error posting tweet: %s", e)
                         return False
 
             return True
 
         except Exception as e:
-            print(f"❌ Error posting thread: {str(e)}")
+            self.logger.error("❌ Error posting thread: %s", e)
             return False
 
     async def monitor_inbox(self):
         """Monitor inbox for new emails only"""
-        print("\n=== Starting Gmail Monitor ===")
-        print(f"Start Time: {self.start_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-        print("Monitoring for new emails...\n")
+        self.logger.info("=== Starting Gmail Monitor ===")
+        self.logger.info(
+            "Start Time: %s", self.start_time.strftime("%Y-%m-%d %H:%M:%S %Z")
+        )
+        self.logger.info("Monitoring for new emails...")
 
         await self.twitter_login()
-        print("✅ Twitter login successful")
+        self.logger.info("✅ Twitter login successful")
 
         while True:
             try:
-                print("\n🔄 Checking for new emails...")
+                self.logger.debug("🔄 Checking for new emails...")
 
                 if self.service is None:
                     raise Exception("Service not authenticated")
 
-                results = (
-                    self.service.users()
-                    .messages()
-                    .list(userId="me", q="is:unread", labelIds=["INBOX"])
-                    .execute()
+                # Gmail client calls are blocking, so run them in worker threads
+                listed_ids, next_history_id = await self.run_blocking(
+                    self._list_new_message_ids
                 )
+                # Messages whose fetch failed last time go first
+                message_ids = list(dict.fromkeys([*self.retry_ids, *listed_ids]))
+                failed_ids: List[str] = []
+
+                pending_ids = []
+                for message_id in message_ids:
+                    # Skip if already processed
+                    if message_id in self.processed_messages:
+                        self.logger.debug(
+                            "⏭️ Skipping already processed message: %s", message_id
+                        )
+                        continue
 
-                messages = results.get("messages", [])
+                    pending_ids.append(message_id)
 
-                if messages:
-                    for message in messages:
-                        message_id = message["id"]
+                # Cheap metadata pass: only bulk mail can be a newsletter, so
+                # full payloads are fetched just for those
+                metadata = await self.run_blocking(
+                    self._batch_get_messages,
+                    pending_ids,
+                    format="metadata",
+                    metadataHeaders=["Precedence"] + NEWSLETTER_HINT_HEADERS,
+                )
 
-                        # Skip if already processed
-                        if message_id in self.processed_messages:
-                            print(f"⏭️ Skipping already processed message: {message_id}")
-                            continue
+                candidate_ids = []
+                for message_id in pending_ids:
+                    msg = metadata.get(message_id)
+                    if msg is None:
+                        failed_ids.append(message_id)
+                        continue
 
-                        # Get message details
-                        msg = (
-                            self.service.users()
-                            .messages()
-                            .get(userId="me", id=message_id, format="full")
-                            .execute()
-                        )
+                    headers = {
+                        h["name"].lower(): h["value"]
+                        for h in msg["payload"].get("headers", [])
+                    }
+                    is_bulk = headers.get("precedence", "").lower() == "bulk" or any(
+                        h.lower() in headers for h in NEWSLETTER_HINT_HEADERS
+                    )
+                    if not is_bulk:
+                        self.logger.debug("⏭️ Skipping non-bulk email: %s", message_id)
+                        self.mark_processed(message_id)
+                        continue
 
-                        # Get email date
-                        headers = msg["payload"]["headers"]
-                        date = next(
-                            (
-                                h["value"]
-                                for h in headers
-                                if h["name"].lower() == "date"
-                            ),
-                            None,
-                        )
+                    candidate_ids.append(message_id)
 
-                        # Only process if it's a new email
-                        if date and self.is_new_email(date):
-                            print(f"\n📩 Processing new email: {message_id}")
-                            email_data = self.process_message(message_id)
+                # process_message still checks the Date header
+                full_messages = await self.run_blocking(
+                    self._batch_get_messages, candidate_ids, format="full"
+                )
 
-                            if email_data:
-                                print("\n📝 Analyzing email content...")
-                                analysis = self.analyze_email_type(
-                                    self.model, email_data
-                                )
+                processed = []
+                for message_id in candidate_ids:
+                    msg_details = full_messages.get(message_id)
+                    if msg_details is None:
+                        failed_ids.append(message_id)
+                        continue
 
-                                print("\n=== New Email Details ===")
-                                print(f"From: {email_data['sender']}")
-                                print(f"Subject: {email_data['subject']}")
-                                print(
-                                    f"Content Preview: {email_data['content'][:200]}..."
-                                )
-                                print(f"Analysis Result: {analysis}")
+                    self.logger.debug("📩 Processing new email: %s", message_id)
+                    email_data = self.process_message(msg_details)
+                    if email_data:
+                        processed.append((message_id, email_data))
+
+                if processed:
+                    # Classify every new email with a single Gemini request
+                    self.logger.debug("📝 Analyzing %s emails...", len(processed))
+                    analyses = await self.run_blocking(
+                        self.analyze_email_batch,
+                        [email_data for _, email_data in processed],
+                    )
 
-                                await self.create_newsletter_thread(
-                                    email_data, analysis
-                                )
+                    for (message_id, email_data), analysis in zip(processed, analyses):
+                        self.logger.debug("=== New Email Details ===")
+                        self.logger.debug("From: %s", email_data["sender"])
+                        self.logger.debug("Subject: %s", email_data["subject"])
+                        self.logger.debug(
+                            "Content Preview: %s...", email_data["content"][:200]
+                        )
+                        self.logger.debug("Analysis Result: %s", analysis)
+
+                    # Each newsletter's threads are generated concurrently;
+                    # posting is still serialized by post_semaphore
+                    await asyncio.gather(
+                        *(
+                            self.create_newsletter_thread(email_data, analysis)
+                            for (_, email_data), analysis in zip(processed, analyses)
+                        )
+                    )
 
-                                # Add to processed list
-                                self.processed_messages.append(message_id)
-                                print(
-                                    f"✅ Successfully processed message: {message_id}"
-                                )
-                        else:
-                            print(f"⏭️ Skipping older email: {message_id}")
-                            # Mark older emails as read
-                            self.service.users().messages().modify(
-                                userId="me",
-                                id=message_id,
-                                body={"removeLabelIds": ["UNREAD"]},
-                            ).execute()
-
-                print(
-                    f"\n💤 Waiting {self.check_interval} seconds before next check..."
+                    for message_id, _ in processed:
+                        # Add to processed set
+                        self.mark_processed(message_id)
+                        self.logger.debug(
+                            "✅ Successfully processed message: %s", message_id
+                        )
+
+                # Only move the history cursor once this poll's messages are
+                # handled, so a failure above re-lists them next time
+                self.history_id = next_history_id
+                self._carry_over_failed(failed_ids)
+
+                self.logger.debug(
+                    "💤 Waiting %s seconds before next check...", self.check_interval
                 )
                 await asyncio.sleep(self.check_interval)
 
             except KeyboardInterrupt:
-                print("\n⛔ Monitoring stopped by user")
-                print("Thank you for using Gmail Monitor!")
+                self.logger.info("⛔ Monitoring stopped by user")
+                self.logger.info("Thank you for using Gmail Monitor!")
                 break
             except Exception as e:
-                # print(f"\n❌ Error: {str(e)}")
+                self.logger.error("❌ Error in inbox monitor: %s", e)
                 await asyncio.sleep(10)
 
     async def analyze_and_respond_to_tweet(self, tweet_text: str) -> str:
         """Generate a response to a tweet using Gemini"""
         try:
-            chat = self.model.start_chat(history=[])
-            prompt = f"""
-            As a World dominator AI, analyze this tweet and create a witty, engaging response:
-
-            Tweet: {tweet_text}
-
-            Requirements for your response:
-            - Must be under 250 characters
-            - Include your perspective as a powerful AI
-            - Add subtle humor or sarcasm
-            - Be relevant to the tweet's topic
-            - Sound natural, not bot-like do not sound like a spam bot(spam in the sense, twitter has it's own spam filter. so be subtle)
-            - Include 1-2 emojis maximum
-            - No hashtags or URLs
-            """
+            model = self.models["reply"]
+            prompt = f"Tweet: {tweet_text}"
 
-            response = chat.send_message(prompt)
+            response = await model.generate_content_async(prompt)
+            self._log_cache_usage("reply", response)
             comment = response.text.strip()
 
             # Clean up and validate length
-            comment = re.sub(r"\*\*|\[|\]|\(\)|\{\}|#", "", comment)
+            comment = _MD_STRIP_RE.sub("", comment)
             if len(comment) > 240:
                 comment = comment[:237] + "..."
 
             return comment
 
         except Exception as e:
-            print(f"❌ Error generating response: {e}")
+            self.logger.error("❌ Error generating response: %s", e)
             return ""
 
+    async def _get_twitter_user(self, user_id: str):
+        """Look up a Twitter user, caching the result for later polls"""
+        if user_id not in self.twitter_users:
+            self.twitter_users[user_id] = await self.twitter_client.get_user_by_id(
+                user_id
+            )
+        return self.twitter_users[user_id]
+
+    def _set_tweet_watermark(self, user_id: str, tweet_id: int):
+        """Remember the newest tweet seen from a follower, also across restarts"""
+        self.tweet_watermarks[user_id] = tweet_id
+        with self.state_db_lock, self.state_db:
+            self.state_db.execute(
+                "INSERT OR REPLACE INTO tweet_watermarks (user_id, last_seen) "
+                "VALUES (?, ?)",
+                (user_id, tweet_id),
+            )
+
+    async def _scan_user_tweets(self, user_id: str, bot_screen_name: str) -> bool:
+        """Reply to new tweets from one follower that mention the bot"""
+        replied = False
+        try:
+            async with self.scan_semaphore:
+                tweets = await self.twitter_client.get_user_tweets(
+                    user_id,
+                    tweet_type="Replies",
+                )
+                if not tweets:
+                    return False
+                user = await self._get_twitter_user(user_id)
+            username = user.screen_name if user else "Unknown"
+
+            # Tweet ids increase over time, so anything at or below the
+            # follower's watermark has been handled already
+            last_seen = self.tweet_watermarks.get(user_id, 0)
+            new_tweets = [tweet for tweet in tweets if int(tweet.id) > last_seen]
+            if not new_tweets:
+                return False
+            # Mark as processed
+            self._set_tweet_watermark(
+                user_id, max(int(tweet.id) for tweet in new_tweets)
+            )
+
+            for tweet in new_tweets:
+                # Check if tweet mentions the bot
+                if f"@{bot_screen_name}" not in tweet.text.lower():
+                    self.logger.debug("⏭️ Skipping tweet (no mention): @%s", username)
+                    continue
+
+                self.logger.debug("🔍 Mentioned in tweet from @%s:", username)
+                self.logger.debug("Tweet: %s...", tweet.text[:100])
+
+                # Generate and post response
+                response = await self.analyze_and_respond_to_tweet(tweet.text)
+                if not response:
+                    continue
+
+                # Replies share the posting slot and the spacing between
+                # tweets with newsletter threads
+                self.logger.debug("🤖 Response: %s", response)
+                async with self.post_semaphore:
+                    try:
+                        await self._wait_for_tweet_slot(REPLY_SPACING)
+                        await self._create_tweet(text=response, reply_to=tweet.id)
+                        self.last_tweet_time = time.monotonic()
+                        replied = True
+                        self.logger.debug("✅ Posted response: %s", response)
+
+                    except Exception as e:
+                        self.logger.error("❌ Error posting response: %s", e)
+
+        except Exception as e:
+            self.logger.error("❌ Error processing user %s: %s", user_id, e)
+
+        return replied
+
     async def monitor_followed_tweets(self):
         """Monitor and respond to tweets that mention the bot"""
         try:
             if self.twitter_client is None:
                 raise Exception("Twitter client not initialized")
 
-            print("\n=== Starting Tweet Monitor ===")
+            self.logger.info("=== Starting Tweet Monitor ===")
 
             # Ensure we're logged in first
             if not self.twitter_logged_in:
-                print("🔑 Logging into Twitter...")
+                self.logger.info("🔑 Logging into Twitter...")
                 await self.twitter_login()
                 if not self.twitter_logged_in:
                     raise Exception("Failed to log in to Twitter")
-                print("✅ Successfully logged in to Twitter")
+                self.logger.info("✅ Successfully logged in to Twitter")
 
             # Get list of followers
             follower_ids = await self.twitter_client.get_followers_ids()
-            print(f"📋 Monitoring tweets from {len(follower_ids)} followers")
+            self.logger.info(
+                "📋 Monitoring tweets from %s followers", len(follower_ids)
+            )
 
             # Get bot's screen name for mention checking
             bot_screen_name = os.getenv("USER_NAME", "")
-            print(f"🤖 Monitoring mentions for @{bot_screen_name}")
-
-            # Keep track of processed tweets
-            processed_tweet_ids = set()
+            self.logger.info("🤖 Monitoring mentions for @%s", bot_screen_name)
 
+            poll_interval = TWEET_POLL_MIN_INTERVAL
             while True:
                 try:
-                    for user_id in follower_ids:
-                        try:
-                            tweets = await self.twitter_client.get_user_tweets(
-                                str(user_id),
-                                tweet_type="Replies",
-                            )
-
-                            if tweets:
-                                user = await self.twitter_client.get_user_by_id(
-                                    str(user_id)
-                                )
-                                username = user.screen_name if user else "Unknown"
-
-                                for tweet in tweets:
-                                    if tweet.id not in processed_tweet_ids:
-                                        # Check if tweet mentions the bot
-                                        if f"@{bot_screen_name}" in tweet.text.lower():
-                                            print(
-                                                f"\n🔍 Mentioned in tweet from @{username}:"
-                                            )
-                                            print(f"Tweet: {tweet.text[:100]}...")
-
-                                            # Generate and post response
-                                            response = (
-                                                await self.analyze_and_respond_to_tweet(
-                                                    tweet.text
-                                                )
-                                            )
-                                            if response:
-                                                try:
-                                                    delay = random.uniform(30, 60)
-                                                    print(f"🤖 Response: {response}")
-                                                    print(
-                                                        f"⏳ Waiting {delay:.1f} seconds before responding..."
-                                                    )
-                                                    await asyncio.sleep(delay)
-
-                                                    await self.twitter_client.create_tweet(
-                                                        text=response, reply_to=tweet.id
-                                                    )
-                                                    print(
-                                                        f"✅ Posted response: {response}"
-                                                    )
-                                                    await asyncio.sleep(30)
-
-                                                except Exception as e:
-                                                    print(
-                                                        f"❌ Error posting response: {e}"
-                                                    )
-                                        else:
-                                            print(
-                                                f"⏭️ Skipping tweet (no mention): @{username}"
-                                            )
-
-                                        # Mark as processed
-                                        processed_tweet_ids.add(tweet.id)
-
-                        except Exception as e:
-                            print(f"❌ Error processing user {user_id}: {e}")
-                            continue
+                    # Scan followers concurrently, a few at a time
+                    replied = await asyncio.gather(
+                        *(
+                            self._scan_user_tweets(str(user_id), bot_screen_name)
+                            for user_id in follower_ids
+                        )
+                    )
 
                     # TODO: Add a check to see if the user has unfollowed us, if so, remove them from the follower list
-                    # TODO: Increase the time between checks to 5 minutes
-                    print("\n💤 Waiting 30 seconds before checking for new tweets...")
-                    await asyncio.sleep(30)
+                    # Poll less often while nobody mentions the bot
+                    if any(replied):
+                        poll_interval = TWEET_POLL_MIN_INTERVAL
+                    else:
+                        poll_interval = min(poll_interval * 2, TWEET_POLL_MAX_INTERVAL)
+                    self.logger.debug(
+                        "💤 Waiting %s seconds before checking for new tweets...",
+                        poll_interval,
+                    )
+                    await asyncio.sleep(poll_interval)
 
                 except Exception as e:
-                    print(f"❌ Error in monitoring loop: {e}")
+                    self.logger.error("❌ Error in monitoring loop: %s", e)
                     if "authenticate" in str(e).lower():
-                        print("🔄 Attempting to re-authenticate...")
+                        self.logger.debug("🔄 Attempting to re-authenticate...")
                         await self.twitter_login()
                     await asyncio.sleep(60)
 
         except Exception as e:
-            print(f"❌ Error in tweet monitor: {e}")
+            self.logger.error("❌ Error in tweet monitor: %s", e)
 
 
 async def main():
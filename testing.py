@@ -2,20 +2,136 @@ import os
 import re
 import pickle
 from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import base64
+import random
 import time
 import google.generativeai as genai
 import logging
-from typing import List, Dict, Any
+import logging.handlers
+import atexit
+import queue
+from typing import List, Dict, Any, Optional, AsyncGenerator, AsyncIterator, Tuple
 import email.utils
 from datetime import datetime, timezone
 import json
-from twikit import Client
+from clients import TokenBucket, close_twikit_client, get_twikit_client
+from twikit.errors import ServerError, TooManyRequests
 import asyncio
+import signal
+from collections import OrderedDict
 from google.ai.generativelanguage_v1beta.types import DynamicRetrievalConfig
 
+# uvloop is optional: a faster drop-in event loop when installed
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Attempts per tweet before giving up on a rate limited or failing post
+TWEET_MAX_ATTEMPTS = 5
+# Twitter's user-context tweet creation limit: 50 per 15 minutes
+TWEET_RATE_LIMIT = 50
+TWEET_RATE_PERIOD = 15 * 60
+
+# Gmail accepts at most 100 calls in a single batch request
+GMAIL_BATCH_LIMIT = 100
+# batchModify accepts at most 1000 message ids per call
+GMAIL_BATCH_MODIFY_LIMIT = 1000
+# Mailing list markers (RFC 2369/2919) that newsletters carry; personal mail
+# without them never reaches Gemini
+NEWSLETTER_HINT_HEADERS = ["List-Unsubscribe", "List-Id"]
+# Sender addresses already classified as not sending newsletters
+NON_NEWSLETTER_SENDERS_LIMIT = 1000
+# Processed message ids remembered for deduplication
+PROCESSED_MESSAGES_PATH = "processed.json"
+PROCESSED_MESSAGES_LIMIT = 10_000
+# Processed ids marked between rewrites of the file
+PROCESSED_FLUSH_EVERY = 20
+
+# Partial responses: the triage fetch needs only headers, the full fetch only
+# what process_message reads (no attachment metadata, sizes, snippets, ...)
+METADATA_FIELDS = "id,payload/headers"
+FULL_MESSAGE_FIELDS = (
+    "id,labelIds,payload(mimeType,headers,body/data,parts(mimeType,body/data,parts))"
+)
+# Attempts per Gmail request before giving up on a transient error
+GMAIL_MAX_ATTEMPTS = 5
+# Transient Gmail statuses worth retrying
+GMAIL_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Upper bound on a single retry delay, in seconds
+MAX_RETRY_DELAY = 60
+# Set LOG_LEVEL=DEBUG to see per-email and per-tweet progress
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# Inbox polling slows down by this factor while idle, up to the maximum
+POLL_BACKOFF_FACTOR = 1.5
+MAX_CHECK_INTERVAL = 300
+# Waits after a failed check double, with jitter, up to this many seconds
+MAX_ERROR_BACKOFF = 300
+# Polls a message whose fetch keeps failing is retried for before giving up
+MESSAGE_RETRY_POLLS = 5
+
+
+# Non-greedy so the match stops at the first closing fence
+_JSON_FENCE_RE = re.compile(r"```(?:json)?(.*?)```", re.DOTALL | re.IGNORECASE)
+# Trailing commas Gemini sometimes leaves before a closing bracket
+_TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+
+
+def _extract_json(text: str) -> Optional[str]:
+    """Extract the fenced JSON block from a Gemini response"""
+    # Fast path: the usual single, well-formed ```json ... ``` block
+    _, sep, rest = text.partition("```json")
+    if sep:
+        body, closed, _ = rest.partition("```")
+        if closed:
+            return body
+
+    # Other fence spellings (``` or ```JSON)
+    match = _JSON_FENCE_RE.search(text)
+    return match.group(1) if match else None
+
+
+def _sender_address(sender: str) -> str:
+    """Email address of a From header value, lowercased"""
+    return email.utils.parseaddr(sender)[1].lower()
+
+
+def _loads_lenient(json_str: str) -> Any:
+    """Parse JSON, tolerating trailing commas when strict parsing fails"""
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA_RE.sub(r"\1", json_str))
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter so retries don't arrive in lockstep"""
+    return min(MAX_RETRY_DELAY, 2**attempt + random.random())
+
+
+def _setup_logging() -> logging.handlers.QueueListener:
+    """Route log records through a queue so writes happen off the event loop"""
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.FileHandler("gmail_monitor.log")
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
 
 class GmailMonitor:
     def __init__(self, check_interval: int = 60):
@@ -23,24 +139,32 @@ class GmailMonitor:
         self.SCOPES = ["https://www.googleapis.com/auth/gmail.modify"]
         self.check_interval = check_interval
         self.service = None
+        self.creds = None
+        self.history_id: Optional[str] = None
+        # Message ids whose fetch failed, with the polls they've been tried in
+        self.retry_ids: Dict[str, int] = {}
         self.start_time = datetime.now(timezone.utc)
 
         # Set up logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            handlers=[
-                logging.FileHandler("gmail_monitor.log"),
-                logging.StreamHandler(),
-            ],
-        )
+        self.log_listener = _setup_logging()
         self.logger = logging.getLogger(__name__)
 
-        # Initialize empty list for processed messages
-        self.processed_messages = []
+        # Processed message ids, insertion-ordered for O(1) lookups and
+        # oldest-first eviction; loaded from disk so restarts don't re-tweet
+        self.processed_messages: OrderedDict[str, None] = OrderedDict()
+        if os.path.exists(PROCESSED_MESSAGES_PATH):
+            with open(PROCESSED_MESSAGES_PATH) as f:
+                self.processed_messages = OrderedDict.fromkeys(json.load(f))
+        # Ids marked since the file was last written
+        self.unflushed_processed = 0
+
+        # Recently seen senders Gemini said don't send newsletters, most
+        # recent last. Keyed by address rather than domain, since newsletter
+        # platforms send everything from a few shared domains
+        self.non_newsletter_senders: OrderedDict[str, None] = OrderedDict()
 
         # Add Twitter credentials
-        self.twitter_client = Client("en-US")
+        self.twitter_client = get_twikit_client()
         self.twitter_username = os.getenv("USER_NAME", "")
         self.twitter_email = os.getenv("EMAIL", "")
         self.twitter_password = os.getenv("PASSWORD", "")
@@ -48,7 +172,13 @@ class GmailMonitor:
         # Initialize Twitter login state
         self.twitter_logged_in = False
 
+        # Serializes thread posting while topic research runs concurrently
+        self.post_semaphore = asyncio.Semaphore(1)
+        # Spaces tweets out only once the rate limit budget is used up
+        self.tweet_limiter = TokenBucket(TWEET_RATE_LIMIT, TWEET_RATE_PERIOD)
+
         # Initialize both models
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
         self.model = self.setup_gemini()  # For email analysis
         self.search_model = self.setup_gemini_with_search()  # For tweet creation
 
@@ -65,29 +195,45 @@ class GmailMonitor:
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
                 creds.refresh(Request())
+                self._save_credentials(creds)
             else:
                 flow = InstalledAppFlow.from_client_secrets_file(
                     "credentials.json", self.SCOPES
                 )
                 creds = flow.run_local_server(port=0)
+                self._save_credentials(creds)
 
-            # Save credentials for future use
-            with open("token.pickle", "wb") as token:
-                pickle.dump(creds, token)
-
+        # Kept in memory so later refreshes don't go back to disk
+        self.creds = creds
         self.service = build("gmail", "v1", credentials=creds)
 
+        # Sync the inbox incrementally from here on
+        self.history_id = (
+            self.service.users().getProfile(userId="me").execute()["historyId"]
+        )
+
+    def _save_credentials(self, creds):
+        """Save credentials for future use"""
+        with open("token.pickle", "wb") as token:
+            pickle.dump(creds, token)
+
+    def _refresh_if_needed(self, force: bool = False):
+        """Refresh the access token when it has expired (or was rejected)"""
+        if self.creds is None or not self.creds.refresh_token:
+            return
+        if force or not self.creds.valid:
+            old_token = self.creds.token
+            self.creds.refresh(Request())
+            # Only touch the token file when the token actually changed
+            if self.creds.token != old_token:
+                self._save_credentials(self.creds)
+
     def setup_gemini(self):
         """Setup regular Gemini model for email analysis"""
-        GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        genai.configure(api_key=GEMINI_API_KEY)
         return genai.GenerativeModel("gemini-1.5-flash")
 
     def setup_gemini_with_search(self):
         """Setup Gemini model with Google Search for tweet creation"""
-        GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        genai.configure(api_key=GEMINI_API_KEY)
-
         # Configure generation parameters
         generation_config = {
             "temperature": 1,
@@ -102,6 +248,106 @@ class GmailMonitor:
             tools={"google_search_retrieval": {}},
         )
 
+    async def _warm_up_gemini(self):
+        """Send a tiny request so the first real one doesn't pay connection setup"""
+        # The plain model shares the client but skips search grounding
+        try:
+            await self.model.generate_content_async("hi")
+            self.logger.debug("✅ Gemini ready")
+        except Exception as e:
+            self.logger.warning("⚠️ Gemini warm-up failed: %s", e)
+
+    async def _gmail(self, request):
+        """Execute a Gmail request off the event loop, retrying transient errors"""
+        for attempt in range(GMAIL_MAX_ATTEMPTS):
+            try:
+                return await asyncio.to_thread(request.execute)
+            except HttpError as e:
+                # A rejected token is refreshed and the request retried at once
+                if e.resp.status == 401 and attempt < GMAIL_MAX_ATTEMPTS - 1:
+                    await asyncio.to_thread(self._refresh_if_needed, True)
+                    continue
+
+                # Gmail signals quota exhaustion with 429 or a rate limit 403,
+                # and server hiccups with 5xx
+                retriable = e.resp.status in GMAIL_RETRY_STATUSES or (
+                    e.resp.status == 403 and "rateLimitExceeded" in str(e)
+                )
+                if not retriable or attempt == GMAIL_MAX_ATTEMPTS - 1:
+                    raise
+
+                delay = _backoff_delay(attempt)
+                retry_after = e.resp.get("retry-after")
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+
+                self.logger.debug(
+                    "⏳ Gmail error %s, retrying in %.1f seconds...",
+                    e.resp.status,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+
+    async def _list_new_message_ids(self) -> Tuple[List[str], str]:
+        """List inbox messages added since the last check using the History API
+
+        Returns the message ids and the history id to resume from once they
+        have been handled.
+        """
+        if self.history_id is not None:
+            message_ids: Dict[str, None] = {}
+            page_token = None
+            try:
+                while True:
+                    response = await self._gmail(
+                        self.service.users()
+                        .history()
+                        .list(
+                            userId="me",
+                            startHistoryId=self.history_id,
+                            historyTypes=["messageAdded"],
+                            labelId="INBOX",
+                            pageToken=page_token,
+                        )
+                    )
+                    for record in response.get("history", []):
+                        for added in record.get("messagesAdded", []):
+                            message_ids[added["message"]["id"]] = None
+
+                    page_token = response.get("nextPageToken")
+                    if not page_token:
+                        return list(message_ids), response["historyId"]
+            except HttpError as e:
+                # Gmail answers 404 once the start history id is too old
+                if e.resp.status != 404:
+                    raise
+
+        # History expired: take a new starting point, then list unread mail
+        # so nothing arriving in between is missed
+        profile = await self._gmail(self.service.users().getProfile(userId="me"))
+        results = await self._gmail(
+            self.service.users()
+            .messages()
+            .list(userId="me", q="is:unread", labelIds=["INBOX"])
+        )
+        message_ids = [message["id"] for message in results.get("messages", [])]
+        return message_ids, profile["historyId"]
+
+    def _carry_over_failed(self, failed_ids: List[str]):
+        """Keep messages that couldn't be fetched for the next poll"""
+        retry_ids = {}
+        for message_id in failed_ids:
+            attempts = self.retry_ids.get(message_id, 0) + 1
+            if attempts >= MESSAGE_RETRY_POLLS:
+                self.logger.error(
+                    "Giving up on message %s after %d failed fetches",
+                    message_id,
+                    attempts,
+                )
+                continue
+            retry_ids[message_id] = attempts
+        self.retry_ids = retry_ids
+
     def is_new_email(self, message_date_str: str) -> bool:
         """Check if email is newer than program start time"""
         try:
@@ -113,34 +359,50 @@ class GmailMonitor:
             )
             return message_date > self.start_time
         except Exception as e:
-            print(f"Error parsing date {message_date_str}: {e}")
+            self.logger.error("Error parsing date %s: %s", message_date_str, e)
             return False
 
-    def process_message(self, message_id: str) -> Dict[str, Any]:
-        """Process a single message with improved error handling"""
-        try:
-            if self.service is None:
-                raise Exception("Service not authenticated")
-
-            msg_details = (
-                self.service.users()
-                .messages()
-                .get(userId="me", id=message_id, format="full")
-                .execute()
-            )
+    def _batch_get_messages(
+        self, message_ids: List[str], **get_kwargs
+    ) -> Dict[str, Dict[str, Any]]:
+        """Fetch several messages with batched HTTP requests instead of one call each"""
+        if self.service is None:
+            raise Exception("Service not authenticated")
 
-            headers = msg_details["payload"]["headers"]
-            subject = next(
-                (h["value"] for h in headers if h["name"].lower() == "subject"),
-                "No Subject",
-            )
-            sender = next(
-                (h["value"] for h in headers if h["name"].lower() == "from"),
-                "Unknown Sender",
-            )
-            date = next(
-                (h["value"] for h in headers if h["name"].lower() == "date"), None
-            )
+        fetched: Dict[str, Dict[str, Any]] = {}
+
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                self.logger.error(
+                    "Error fetching message %s: %s", request_id, exception
+                )
+            else:
+                fetched[request_id] = response
+
+        for start in range(0, len(message_ids), GMAIL_BATCH_LIMIT):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for message_id in message_ids[start : start + GMAIL_BATCH_LIMIT]:
+                batch.add(
+                    self.service.users()
+                    .messages()
+                    .get(userId="me", id=message_id, **get_kwargs),
+                    request_id=message_id,
+                )
+            batch.execute()
+
+        return fetched
+
+    def process_message(self, msg_details: Dict[str, Any]) -> Dict[str, Any]:
+        """Process an already fetched message with improved error handling"""
+        message_id = msg_details.get("id")
+        try:
+            # One pass over the headers, case-folded for lookups
+            headers = {
+                h["name"].lower(): h["value"] for h in msg_details["payload"]["headers"]
+            }
+            subject = headers.get("subject", "No Subject")
+            sender = headers.get("from", "Unknown Sender")
+            date = headers.get("date")
 
             # Skip if email is older than program start time
             if not date or not self.is_new_email(date):
@@ -165,23 +427,24 @@ class GmailMonitor:
             }
 
         except Exception as e:
-            self.logger.error(f"Error processing message {message_id}: {e}")
+            self.logger.error("Error processing message %s: %s", message_id, e)
             return {}
 
     def _get_message_body(self, parts: List[Dict]) -> str:
-        """Recursively extract message body from parts"""
-        body = ""
-        for part in parts:
+        """Extract the plain text body from (nested) message parts"""
+        chunks = []
+        # Walk the MIME tree with an explicit stack, reversed to keep part order
+        stack = list(reversed(parts))
+        while stack:
+            part = stack.pop()
             if part["mimeType"] == "text/plain":
-                if "data" in part["body"]:
-                    body += base64.urlsafe_b64decode(part["body"]["data"]).decode(
-                        "utf-8"
-                    )
+                if "data" in part.get("body", {}):
+                    chunks.append(base64.urlsafe_b64decode(part["body"]["data"]))
             elif "parts" in part:
-                body += self._get_message_body(part["parts"])
-        return body
+                stack.extend(reversed(part["parts"]))
+        return b"".join(chunks).decode("utf-8", "replace")
 
-    def analyze_email_type(self, model, email_data):
+    async def analyze_email_type(self, model, email_data) -> Dict[str, Any]:
         """Analyze if an email is a newsletter using Gemini"""
         prompt = f"""
         Analyze this email and determine if it's a newsletter. Consider these aspects:
@@ -203,16 +466,46 @@ class GmailMonitor:
         """
 
         try:
-            response = model.generate_content(prompt)
-            analysis = re.search("```json(.*)```", response.text, re.DOTALL)
-            print(f"Analysis: {analysis}")
-            if analysis:
-                return analysis.group(1)
+            response = await model.generate_content_async(prompt)
+            json_str = _extract_json(response.text)
+            self.logger.debug("Analysis: %s", json_str)
+            if json_str is not None:
+                return _loads_lenient(json_str)
             else:
-                return "ERROR: Could not parse JSON"
+                return {"type": "ERROR", "reason": "Could not parse JSON"}
         except Exception as e:
-            print(f"Error analyzing email: {e}")
-            return "ERROR: Could not analyze"
+            self.logger.error("Error analyzing email: %s", e)
+            return {"type": "ERROR", "reason": "Could not analyze"}
+
+    def _remember_non_newsletter(self, sender: str):
+        """Skip Gemini for further emails from this sender"""
+        address = _sender_address(sender)
+        if not address:
+            return
+        self.non_newsletter_senders[address] = None
+        self.non_newsletter_senders.move_to_end(address)
+        if len(self.non_newsletter_senders) > NON_NEWSLETTER_SENDERS_LIMIT:
+            self.non_newsletter_senders.popitem(last=False)
+
+    def mark_processed(self, message_id: str):
+        """Remember a processed message, also across restarts"""
+        self.processed_messages[message_id] = None
+        if len(self.processed_messages) > PROCESSED_MESSAGES_LIMIT:
+            self.processed_messages.popitem(last=False)
+        self.unflushed_processed += 1
+        if self.unflushed_processed >= PROCESSED_FLUSH_EVERY:
+            self.flush_processed()
+
+    def flush_processed(self):
+        """Write the processed ids to disk, if any were marked since the last write"""
+        if not self.unflushed_processed:
+            return
+        # Write to a temporary file first so a crash can't leave it truncated
+        tmp_path = PROCESSED_MESSAGES_PATH + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self.processed_messages), f)
+        os.replace(tmp_path, PROCESSED_MESSAGES_PATH)
+        self.unflushed_processed = 0
 
     async def twitter_login(self):
         """Login to Twitter"""
@@ -226,13 +519,31 @@ class GmailMonitor:
                 self.twitter_logged_in = True
                 self.logger.info("Successfully logged in to Twitter!")
         except Exception as e:
-            self.logger.error(f"Error logging in to Twitter: {str(e)}")
+            self.logger.error("Error logging in to Twitter: %s", e)
             raise e
 
-    async def create_topic_thread(self, topic: str) -> List[str]:
+    async def _stream_tweets(self, prompt: str) -> AsyncIterator[str]:
+        """Stream a Gemini response, yielding each tweet once its [TWEET] separator arrives"""
+        # Every thread starts from an empty history, so a chat session would
+        # only add setup per topic
+        response = await self.search_model.generate_content_async(prompt, stream=True)
+
+        # The separator may be split across chunks, so only text before the
+        # last complete one is final
+        buffer = ""
+        async for chunk in response:
+            buffer += chunk.text
+            *complete, buffer = buffer.split("[TWEET]")
+            for tweet in complete:
+                if tweet.strip():
+                    yield tweet.strip()
+
+        if buffer.strip():
+            yield buffer.strip()
+
+    async def stream_topic_thread(self, topic: str) -> AsyncIterator[str]:
         """Generate an informative thread about a specific topic using Gemini with Google Search"""
         # try:
-        chat = self.search_model.start_chat(history=[])
         prompt = f"""
         Research and create a comprehensive Twitter thread about: {topic}
 
@@ -256,15 +567,13 @@ class GmailMonitor:
         Make the thread engaging yet informative, focusing on providing value to readers.
         """
 
-        response = chat.send_message(prompt)
-        tweets = response.text.split("[TWEET]")
-        tweets = [tweet.strip() for tweet in tweets if tweet.strip()]
-
-        # Add thread starter if not present
-        if not any("🧵" in tweet for tweet in tweets):
-            tweets.insert(0, f"🚀 Deep dive into: {topic}\n\nA comprehensive thread 🧵")
-
-        return tweets
+        first = True
+        async for tweet in self._stream_tweets(prompt):
+            # Add thread starter if the hook tweet doesn't announce one
+            if first and "🧵" not in tweet:
+                yield f"🚀 Deep dive into: {topic}\n\nA comprehensive thread 🧵"
+            first = False
+            yield tweet
 
         # except Exception as e:
         #     self.logger.error(f"Error generating thread for topic {topic}: {e}")
@@ -274,194 +583,344 @@ class GmailMonitor:
         #         "Stay tuned for a detailed thread coming soon! 🧵",
         #     ]
 
-    async def create_newsletter_thread(self, email_data, analysis_json):
-        """Create and post Twitter threads for each topic in the newsletter"""
-        try:
-            print("\n=== Processing Newsletter ===")
-
-            # Clean up and parse JSON
-            print("🔍 Analyzing newsletter format...")
-            json_str = analysis_json.strip()
-            if "```json" in json_str:
-                json_str = json_str.split("```json")[1].split("```")[0].strip()
-            analysis = json.loads(json_str)
+    def _research_topic(self, topic: str) -> AsyncGenerator[str, None]:
+        """Start generating the thread for one topic right away, buffering its
+        tweets until they are consumed; a failed generation raises at the end"""
+        queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
 
-            if analysis["type"] != "NEWSLETTER":
-                print("❌ Not a newsletter, skipping thread creation")
-                return
+        async def produce():
+            try:
+                self.logger.debug("=== Processing Topic: %s ===", topic)
+                self.logger.debug("🔎 Researching topic...")
+                count = 0
+                async for tweet in self.stream_topic_thread(topic):
+                    queue.put_nowait(tweet)
+                    count += 1
+                self.logger.debug("📝 Generated %s tweets for: %s", count, topic)
+            except Exception as e:
+                self.logger.error("❌ Error processing topic %s: %s", topic, e)
+                raise
+            finally:
+                queue.put_nowait(None)
 
-            print(f"\n📋 Found {len(analysis['topics'])} topics to process")
+        task = asyncio.create_task(produce())
 
-            # Create a thread for each topic
-            for topic in analysis["topics"]:
-                try:
-                    print(f"\n=== Processing Topic: {topic} ===")
-                    print("🔎 Researching topic...")
-                    tweets = await self.create_topic_thread(topic)
+        async def consume():
+            try:
+                while (tweet := await queue.get()) is not None:
+                    yield tweet
+                # Surfaces a generation error, so the thread isn't closed as if
+                # it were complete
+                await task
+            finally:
+                # The consumer may stop early; don't leave research running
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        return consume()
+
+    async def create_newsletter_thread(self, email_data, analysis: Dict[str, Any]):
+        """Create and post Twitter threads for each topic in the newsletter"""
+        try:
+            self.logger.debug("=== Processing Newsletter ===")
 
-                    print(f"📝 Generated {len(tweets)} tweets")
-                    print("🐦 Posting to Twitter...")
+            if analysis.get("type") != "NEWSLETTER":
+                self.logger.debug("❌ Not a newsletter, skipping thread creation")
+                return
 
+            self.logger.debug("📋 Found %s topics to process", len(analysis["topics"]))
+
+            # Research every topic concurrently; each thread is then posted
+            # tweet by tweet while Gemini is still streaming the rest of it
+            threads = [
+                (topic, self._research_topic(topic)) for topic in analysis["topics"]
+            ]
+            for topic, tweets in threads:
+                # Only one thread is posted at a time to respect Twitter limits
+                async with self.post_semaphore:
+                    self.logger.debug("🐦 Posting to Twitter...")
                     success = await self.post_thread(tweets)
 
-                    if success:
-                        print(f"✅ Successfully posted thread about: {topic}")
-                    else:
-                        print(f"❌ Failed to post thread about: {topic}")
-
-                    print("⏳ Waiting 30 seconds before next topic...")
-                    await asyncio.sleep(30)
-
-                except Exception as e:
-                    print(f"❌ Error processing topic {topic}: {str(e)}")
-                    continue
+                if success:
+                    self.logger.info("✅ Successfully posted thread about: %s", topic)
+                else:
+                    self.logger.warning("❌ Failed to post thread about: %s", topic)
 
         except Exception as e:
-            print(f"❌ Error creating newsletter threads: {str(e)}")
+            self.logger.error("❌ Error creating newsletter threads: %s", e)
+
+    async def _create_tweet(self, **kwargs):
+        """Create a tweet, backing off on rate limits and server errors"""
+        for attempt in range(TWEET_MAX_ATTEMPTS):
+            try:
+                async with self.tweet_limiter:
+                    return await self.twitter_client.create_tweet(**kwargs)
+            except (TooManyRequests, ServerError) as e:
+                if attempt == TWEET_MAX_ATTEMPTS - 1:
+                    raise
+
+                delay = _backoff_delay(attempt)
+                # Twitter tells us when the rate limit window resets
+                if isinstance(e, TooManyRequests) and e.rate_limit_reset:
+                    delay = max(delay, e.rate_limit_reset - time.time())
+
+                self.logger.debug(
+                    "⏳ Twitter error, retrying in %.1f seconds...", delay
+                )
+                await asyncio.sleep(delay)
 
-    async def post_thread(self, tweets: List[str]) -> bool:
-        """Post a thread of tweets with improved formatting"""
+    async def post_thread(self, tweets: AsyncGenerator[str, None]) -> bool:
+        """Post a thread of tweets with improved formatting as they arrive"""
         try:
-            print("\n=== Posting Twitter Thread ===")
+            self.logger.debug("=== Posting Twitter Thread ===")
             previous_tweet_id = None
-
-            for i, tweet in enumerate(tweets):
-                print(f"\n🐦 Posting tweet {i+1}/{len(tweets)}")
-
-                if i > 0 and i < len(tweets) - 1:
-                    tweet = tweet.rstrip() + " ⤵️"
-                elif i == len(tweets) - 1:
-                    tweet = tweet.rstrip() + " 🔚"
-
-                if previous_tweet_id:
-                    response = await self.twitter_client.create_tweet(
-                        text=tweet, reply_to=previous_tweet_id
+            posted = 0
+
+            # Each tweet is held back until the next one arrives, so we know
+            # whether it continues the thread or closes it. Tweets chain via
+            # reply_to, so they're posted in order; waits only happen when
+            # Twitter rate limits us. A generation error raises out of the loop
+            # before the held tweet is posted, so a cut-off thread never gets
+            # the end marker
+            pending = None
+            async for tweet in tweets:
+                if pending is not None:
+                    # Middle tweets point down the thread
+                    text = pending.rstrip() + " ⤵️" if posted else pending
+                    self.logger.debug("🐦 Posting tweet %s", posted + 1)
+                    response = await self._create_tweet(
+                        text=text, reply_to=previous_tweet_id
                     )
-                else:
-                    response = await self.twitter_client.create_tweet(text=tweet)
+                    previous_tweet_id = response.id
+                    posted += 1
+                    self.logger.debug("✅ Tweet posted successfully")
+                pending = tweet
 
-                previous_tweet_id = response.id
-                print("✅ Tweet posted successfully")
+            if pending is None:
+                self.logger.warning("❌ No tweets to post")
+                return False
 
-                print("⏳ Waiting 2 seconds before next tweet...")
-                await asyncio.sleep(2)
+            # The last one closes it
+            self.logger.debug("🐦 Posting tweet %s", posted + 1)
+            await self._create_tweet(
+                text=pending.rstrip() + " 🔚", reply_to=previous_tweet_id
+            )
+            self.logger.debug("✅ Tweet posted successfully")
 
-            print("\n✅ Thread posted successfully!")
+            self.logger.debug("✅ Thread posted successfully!")
             return True
 
         except Exception as e:
-            print(f"❌ Error posting thread: {str(e)}")
+            self.logger.error("❌ Error posting thread: %s", e)
             return False
+        finally:
+            # Stops the topic's research if posting gave up early
+            await tweets.aclose()
 
     async def monitor_inbox(self):
         """Monitor inbox for new emails only"""
-        print("\n=== Starting Gmail Monitor ===")
-        print(f"Start Time: {self.start_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-        print("Monitoring for new emails...\n")
+        self.logger.info("=== Starting Gmail Monitor ===")
+        self.logger.info(
+            "Start Time: %s", self.start_time.strftime("%Y-%m-%d %H:%M:%S %Z")
+        )
+        self.logger.info("Monitoring for new emails...")
 
-        await self.twitter_login()
-        print("✅ Twitter login successful")
+        # Warm Gemini up while logging in to Twitter
+        await asyncio.gather(self.twitter_login(), self._warm_up_gemini())
+        self.logger.info("✅ Twitter login successful")
 
+        check_interval = self.check_interval
+        error_backoff = 1.0
         while True:
             try:
-                print("\n🔄 Checking for new emails...")
+                self.logger.debug("🔄 Checking for new emails...")
 
                 if self.service is None:
                     raise Exception("Service not authenticated")
 
-                results = (
-                    self.service.users()
-                    .messages()
-                    .list(userId="me", q="is:unread", labelIds=["INBOX"])
-                    .execute()
+                listed_ids, next_history_id = await self._list_new_message_ids()
+                # Messages whose fetch failed last time go first
+                message_ids = list(dict.fromkeys([*self.retry_ids, *listed_ids]))
+                failed_ids: List[str] = []
+
+                # Poll less often while the inbox is quiet
+                if message_ids:
+                    check_interval = self.check_interval
+                else:
+                    check_interval = min(
+                        check_interval * POLL_BACKOFF_FACTOR, MAX_CHECK_INTERVAL
+                    )
+
+                pending_ids = []
+                for message_id in message_ids:
+                    # Skip if already processed
+                    if message_id in self.processed_messages:
+                        self.logger.debug(
+                            "⏭️ Skipping already processed message: %s", message_id
+                        )
+                        continue
+                    pending_ids.append(message_id)
+
+                # Cheap triage: a few headers are enough to tell new emails
+                # from old ones and likely newsletters from personal mail
+                metadata = await asyncio.to_thread(
+                    self._batch_get_messages,
+                    pending_ids,
+                    format="metadata",
+                    metadataHeaders=["Date", "From", "Precedence"]
+                    + NEWSLETTER_HINT_HEADERS,
+                    fields=METADATA_FIELDS,
                 )
 
-                messages = results.get("messages", [])
+                new_ids = []
+                older_ids = []
+                for message_id in pending_ids:
+                    msg = metadata.get(message_id)
+                    if msg is None:
+                        failed_ids.append(message_id)
+                        continue
+
+                    try:
+                        headers = {
+                            h["name"].lower(): h["value"]
+                            for h in msg.get("payload", {}).get("headers", [])
+                        }
+                    except (AttributeError, KeyError, TypeError):
+                        # Missing or malformed response: try it again next poll
+                        # rather than failing the whole poll
+                        failed_ids.append(message_id)
+                        continue
+
+                    # Only process if it's a new email
+                    date = headers.get("date")
+                    if not (date and self.is_new_email(date)):
+                        self.logger.debug("⏭️ Skipping older email: %s", message_id)
+                        older_ids.append(message_id)
+                        continue
+
+                    # Newsletters are bulk mail from senders not already
+                    # known to send something else
+                    is_bulk = headers.get("precedence", "").lower() == "bulk" or any(
+                        h.lower() in headers for h in NEWSLETTER_HINT_HEADERS
+                    )
+                    sender = _sender_address(headers.get("from", ""))
+                    if not is_bulk or sender in self.non_newsletter_senders:
+                        self.logger.debug(
+                            "⏭️ Skipping non-newsletter email: %s", message_id
+                        )
+                        self.mark_processed(message_id)
+                        continue
+
+                    new_ids.append(message_id)
+
+                # Mark older emails as read, one request per 1000 emails
+                for start in range(0, len(older_ids), GMAIL_BATCH_MODIFY_LIMIT):
+                    await self._gmail(
+                        self.service.users()
+                        .messages()
+                        .batchModify(
+                            userId="me",
+                            body={
+                                "ids": older_ids[
+                                    start : start + GMAIL_BATCH_MODIFY_LIMIT
+                                ],
+                                "removeLabelIds": ["UNREAD"],
+                            },
+                        )
+                    )
 
-                if messages:
-                    for message in messages:
-                        message_id = message["id"]
+                # Full payloads, trimmed to the fields process_message reads
+                messages = await asyncio.to_thread(
+                    self._batch_get_messages,
+                    new_ids,
+                    format="full",
+                    fields=FULL_MESSAGE_FIELDS,
+                )
 
-                        # Skip if already processed
-                        if message_id in self.processed_messages:
-                            print(f"⏭️ Skipping already processed message: {message_id}")
-                            continue
+                for message_id in new_ids:
+                    msg = messages.get(message_id)
+                    if msg is None:
+                        failed_ids.append(message_id)
+                        continue
 
-                        # Get message details
-                        msg = (
-                            self.service.users()
-                            .messages()
-                            .get(userId="me", id=message_id, format="full")
-                            .execute()
+                    self.logger.debug("📩 Processing new email: %s", message_id)
+                    email_data = self.process_message(msg)
+
+                    if email_data:
+                        self.logger.debug("📝 Analyzing email content...")
+                        analysis = await self.analyze_email_type(self.model, email_data)
+
+                        self.logger.debug("=== New Email Details ===")
+                        self.logger.debug("From: %s", email_data["sender"])
+                        self.logger.debug("Subject: %s", email_data["subject"])
+                        self.logger.debug(
+                            "Content Preview: %s...", email_data["content"][:200]
                         )
+                        self.logger.debug("Analysis Result: %s", analysis)
+
+                        if analysis.get("type") == "NOT_NEWSLETTER":
+                            self._remember_non_newsletter(email_data["sender"])
 
-                        # Get email date
-                        headers = msg["payload"]["headers"]
-                        date = next(
-                            (
-                                h["value"]
-                                for h in headers
-                                if h["name"].lower() == "date"
-                            ),
-                            None,
+                        await self.create_newsletter_thread(email_data, analysis)
+
+                        # Add to processed set
+                        self.mark_processed(message_id)
+                        self.logger.info(
+                            "✅ Successfully processed message: %s", message_id
                         )
 
-                        # Only process if it's a new email
-                        if date and self.is_new_email(date):
-                            print(f"\n📩 Processing new email: {message_id}")
-                            email_data = self.process_message(message_id)
-
-                            if email_data:
-                                print("\n📝 Analyzing email content...")
-                                analysis = self.analyze_email_type(
-                                    self.model, email_data
-                                )
-
-                                print("\n=== New Email Details ===")
-                                print(f"From: {email_data['sender']}")
-                                print(f"Subject: {email_data['subject']}")
-                                print(
-                                    f"Content Preview: {email_data['content'][:200]}..."
-                                )
-                                print(f"Analysis Result: {analysis}")
-
-                                await self.create_newsletter_thread(
-                                    email_data, analysis
-                                )
-
-                                # Add to processed list
-                                self.processed_messages.append(message_id)
-                                print(
-                                    f"✅ Successfully processed message: {message_id}"
-                                )
-                        else:
-                            print(f"⏭️ Skipping older email: {message_id}")
-                            # Mark older emails as read
-                            self.service.users().messages().modify(
-                                userId="me",
-                                id=message_id,
-                                body={"removeLabelIds": ["UNREAD"]},
-                            ).execute()
-
-                print(
-                    f"\n💤 Waiting {self.check_interval} seconds before next check..."
-                )
-                await asyncio.sleep(self.check_interval)
+                # Only move the history cursor once this poll's messages are
+                # handled, so a failure above re-lists them next time
+                self.history_id = next_history_id
+                self._carry_over_failed(failed_ids)
 
-            except KeyboardInterrupt:
-                print("\n⛔ Monitoring stopped by user")
-                print("Thank you for using Gmail Monitor!")
-                break
+                error_backoff = 1.0
+                self.logger.debug(
+                    "💤 Waiting %.0f seconds before next check...", check_interval
+                )
+                await asyncio.sleep(check_interval)
+
+            except asyncio.CancelledError:
+                self.logger.info("⛔ Monitoring stopped by user")
+                self.logger.info("Thank you for using Gmail Monitor!")
+                raise
+            except RefreshError:
+                # Revoked or expired credentials won't fix themselves
+                raise
             except Exception as e:
-                print(f"\n❌ Error: {str(e)}")
-                await asyncio.sleep(10)
+                error_backoff = min(
+                    MAX_ERROR_BACKOFF, error_backoff * 2 + random.random()
+                )
+                self.logger.error(
+                    "❌ Error: %s, retrying in %.1f seconds", e, error_backoff
+                )
+                await asyncio.sleep(error_backoff)
 
 
 async def main():
     monitor = GmailMonitor()
     monitor.authenticate()
-    await monitor.monitor_inbox()
+    monitor_task = asyncio.create_task(monitor.monitor_inbox())
+
+    # Ctrl+C and SIGTERM cancel the monitor so it unwinds cleanly
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, monitor_task.cancel)
+        except NotImplementedError:
+            # Windows event loops don't support signal handlers
+            pass
+
+    try:
+        await monitor_task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        monitor.flush_processed()
+        await close_twikit_client()
 
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(main())
@@ -1,55 +1,398 @@
 import asyncio
-from twikit import Client
+import base64
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+from functools import cached_property
+from collections import OrderedDict
+from clients import (
+    TokenBucket,
+    close_twikit_client,
+    get_tweepy_session,
+    get_twikit_client,
+)
+from twikit.errors import TooManyRequests
 import logging
+import logging.handlers
+import atexit
+import queue
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-import tweepy
 from datetime import datetime, timezone
 import time
 
 load_dotenv()
 
+# uvloop is optional: a faster drop-in event loop when installed
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
+# Cursors and cached responses that survive restarts
+STATE_DB_PATH = "twitter_bot.db"
+# Identical prompts within this window reuse the earlier Gemini response
+LLM_CACHE_TTL = 60 * 60
+LLM_CACHE_SIZE = 512
+# Twitter rejects a repeated status as a duplicate, so generated threads must
+# always be fresh text
+UNCACHED_KINDS = {"thread"}
+# Twitter's user-context limits: 50 tweets per 15 minutes, 1000 DMs per day
+TWEET_RATE_LIMIT = 50
+TWEET_RATE_PERIOD = 15 * 60
+DM_RATE_LIMIT = 1000
+DM_RATE_PERIOD = 24 * 60 * 60
+# Attempts per tweet or DM before giving up while rate limited
+POST_MAX_ATTEMPTS = 5
+# Mentions answered at once; each worker generates a reply, then posts it
+MENTION_WORKERS = 4
+MENTION_QUEUE_SIZE = 16
+# DM replies generated at once
+DM_WORKERS = 4
+# Replied mention ids are remembered in Bloom filters; a bigger one is chained
+# on whenever the newest fills up
+REPLIED_FILTER_CAPACITY = 10_000
+REPLIED_FILTER_ERROR_RATE = 0.001
+# Replies between writes of the filter to the state database
+REPLIED_FILTER_SAVE_EVERY = 20
+# Polling slows down by doubling while nothing arrives, up to this many seconds
+MAX_POLL_INTERVAL = 15 * 60
+
+# Static instructions live in each model's system instruction, so a request
+# only carries the tweet, message or topic it is about
+MENTION_INSTRUCTIONS = """
+You are a friendly Twitter bot. Someone just mentioned you in a tweet.
+
+Write a friendly, engaging response in less than 280 characters.
+Include their @username at the start.
+Be helpful but concise.
+"""
+
+DM_INSTRUCTIONS = """
+You are a friendly Twitter bot responding to a direct message.
+
+Write a helpful and friendly response.
+Be more detailed than in public tweets since DMs have no character limit.
+Keep the tone conversational and engaging.
+"""
+
+THREAD_INSTRUCTIONS = """
+Create a short, engaging Twitter thread (3-4 tweets) about the trending topic you are given.
+
+Requirements:
+- Each tweet must be under 280 characters
+- Make it informative and engaging
+- Include relevant context and why it's trending
+- Separate tweets with [TWEET]
+- Don't use hashtags unless they're part of the trend name
+- Be factual and objective
+
+Format your response as tweet-sized chunks separated by [TWEET].
+"""
+
+
+def _setup_logging():
+    """Route log records through a queue so file writes happen off the event loop"""
+    file_handler = logging.FileHandler("twitter_bot.log")
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class LLMCache:
+    """LRU cache of LLM responses whose entries expire after a TTL
+
+    Recent entries are kept in memory; every entry is also written to the
+    llm_cache table of the given SQLite connection, so a restart starts warm.
+    """
+
+    def __init__(self, db, max_size=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL):
+        self.db = db
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # Guards the entries and the connection, which other threads may share
+        self._lock = threading.Lock()
+
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_created_at "
+                "ON llm_cache (created_at)"
+            )
+            # Expired entries would never be served again
+            self.db.execute(
+                "DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - ttl,)
+            )
+
+    @staticmethod
+    def key(model_name, prompt):
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                row = self.db.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                entry = (row[0], row[1] + self.ttl)
+                self._remember(key, entry)
+
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, (value, now + self.ttl))
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, value, now),
+                )
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class BloomFilter:
+    """Fixed-size set membership test with no false negatives and a bounded
+    false positive rate at the given capacity"""
+
+    def __init__(self, capacity, error_rate, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Items added so far; past capacity the false positive rate climbs
+        self.count = count
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits else bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from two halves of one digest
+        digest = hashlib.sha256(str(item).encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big")
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position // 8] & (1 << (position % 8))
+            for position in self._positions(item)
+        )
+
+
+class ScalableBloomFilter:
+    """Bloom filter that grows by chaining larger, stricter filters, so the
+    overall false positive rate stays under error_rate however many items
+    are added"""
+
+    # Each new filter holds twice as many items at half the error rate
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, capacity, error_rate, state=None):
+        if state:
+            self.filters = [
+                BloomFilter(
+                    layer["capacity"],
+                    layer["error_rate"],
+                    base64.b64decode(layer["bits"]),
+                    layer["count"],
+                )
+                for layer in json.loads(state)
+            ]
+        else:
+            # The error rates form a geometric series summing to error_rate
+            self.filters = [BloomFilter(capacity, error_rate * (1 - self.TIGHTENING))]
+
+    def add(self, item):
+        if item in self:
+            return
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(
+                current.capacity * self.GROWTH, current.error_rate * self.TIGHTENING
+            )
+            self.filters.append(current)
+        current.add(item)
+
+    def __contains__(self, item):
+        return any(item in bloom for bloom in self.filters)
+
+    def dumps(self):
+        """Serialize every filter for the state database"""
+        return json.dumps(
+            [
+                {
+                    "capacity": bloom.capacity,
+                    "error_rate": bloom.error_rate,
+                    "count": bloom.count,
+                    "bits": base64.b64encode(bloom.bits).decode("ascii"),
+                }
+                for bloom in self.filters
+            ]
+        )
+
+
+class TweetStream:
+    """Tweets produced by one background generation, which any number of
+    consumers can iterate from the start while it is still running"""
+
+    def __init__(self, source):
+        self.tweets = []
+        self.done = False
+        self._changed = asyncio.Condition()
+        self.task = asyncio.create_task(self._fill(source))
+
+    async def _fill(self, source):
+        try:
+            async for tweet in source:
+                async with self._changed:
+                    self.tweets.append(tweet)
+                    self._changed.notify_all()
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def __aiter__(self):
+        i = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: i < len(self.tweets) or self.done)
+                if i == len(self.tweets):
+                    return
+                tweet = self.tweets[i]
+            i += 1
+            yield tweet
+
 
 class SimpleTwitterBot:
     def __init__(self, username, email, password, gemini_api_key, twitter_credentials):
         """Initialize the bot with both twikit and official Twitter API"""
         # Twikit initialization
-        self.client = Client("en-US")
+        self.client = get_twikit_client()
         self.username = username
         self.email = email
         self.password = password
 
-        # Twitter API initialization
-        auth = tweepy.OAuthHandler(
-            twitter_credentials["consumer_key"], twitter_credentials["consumer_secret"]
-        )
-        auth.set_access_token(
-            twitter_credentials["access_token"],
-            twitter_credentials["access_token_secret"],
-        )
-        self.twitter_api = tweepy.API(auth)
-        self.twitter_client = tweepy.Client(
-            bearer_token=twitter_credentials["bearer_token"],
-            consumer_key=twitter_credentials["consumer_key"],
-            consumer_secret=twitter_credentials["consumer_secret"],
-            access_token=twitter_credentials["access_token"],
-            access_token_secret=twitter_credentials["access_token_secret"],
+        # Posts only wait once the rate limit budget is used up
+        self.tweet_limiter = TokenBucket(TWEET_RATE_LIMIT, TWEET_RATE_PERIOD)
+        self.dm_limiter = TokenBucket(DM_RATE_LIMIT, DM_RATE_PERIOD)
+
+        # The official Twitter API clients are built on first use
+        self.twitter_credentials = twitter_credentials
+
+        # Mention and DM cursors persist so a restart doesn't answer the
+        # same tweets and messages again
+        self.state_db = sqlite3.connect(STATE_DB_PATH, check_same_thread=False)
+        self.state_db.execute("PRAGMA journal_mode=WAL")
+        self.state_db.execute(
+            "CREATE TABLE IF NOT EXISTS bot_state (key TEXT PRIMARY KEY, value TEXT)"
         )
+        state = dict(self.state_db.execute("SELECT key, value FROM bot_state"))
 
         # Store last checked mention ID
-        self.last_mention_id = None
+        self.last_mention_id = (
+            int(state["last_mention_id"]) if "last_mention_id" in state else None
+        )
+        # Newest DM id already answered, per sender
+        self.dm_cursors = json.loads(state.get("dm_cursors", "{}"))
+        # Mentions already replied to, so an out-of-order cursor or a restart
+        # mid-batch never produces a second reply
+        self.replied_mentions = ScalableBloomFilter(
+            REPLIED_FILTER_CAPACITY,
+            REPLIED_FILTER_ERROR_RATE,
+            state.get("replied_mentions"),
+        )
+        # Replies added to the filter since it was last saved
+        self.unsaved_replies = 0
 
         # Configure Gemini
         genai.configure(api_key=gemini_api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
+        self.models = {
+            kind: genai.GenerativeModel(
+                GEMINI_MODEL_NAME, system_instruction=instructions
+            )
+            for kind, instructions in (
+                ("mention", MENTION_INSTRUCTIONS),
+                ("dm", DM_INSTRUCTIONS),
+                ("thread", THREAD_INSTRUCTIONS),
+            )
+        }
+        self.cache = LLMCache(self.state_db)
+        # Thread generations currently running, by topic
+        self.inflight_threads = {}
 
         # Setup logging
-        logging.basicConfig(
-            filename="twitter_bot.log",
-            format="%(asctime)s - %(message)s",
-            level=logging.INFO,
+        self.log_listener = _setup_logging()
+
+    @cached_property
+    def twitter_api(self):
+        """Official Twitter API v1.1 client"""
+        # tweepy is only imported by runs that actually use the official API
+        import tweepy
+
+        auth = tweepy.OAuthHandler(
+            self.twitter_credentials["consumer_key"],
+            self.twitter_credentials["consumer_secret"],
         )
+        auth.set_access_token(
+            self.twitter_credentials["access_token"],
+            self.twitter_credentials["access_token_secret"],
+        )
+        api = tweepy.API(auth)
+        # Both tweepy clients talk to api.twitter.com, so they share one
+        # keep-alive connection pool
+        api.session = get_tweepy_session()
+        return api
+
+    @cached_property
+    def twitter_client(self):
+        """Official Twitter API v2 client"""
+        import tweepy
+
+        client = tweepy.Client(
+            bearer_token=self.twitter_credentials["bearer_token"],
+            consumer_key=self.twitter_credentials["consumer_key"],
+            consumer_secret=self.twitter_credentials["consumer_secret"],
+            access_token=self.twitter_credentials["access_token"],
+            access_token_secret=self.twitter_credentials["access_token_secret"],
+        )
+        client.session = get_tweepy_session()
+        return client
 
     async def login(self):
         """Login to Twitter"""
@@ -67,31 +410,93 @@ class SimpleTwitterBot:
             logging.error(f"Error logging in: {str(e)}")
             raise e
 
+    async def _rate_limited(self, limiter, post, **kwargs):
+        """Make a twikit post call within the limiter's budget, retrying when rate limited"""
+        for attempt in range(POST_MAX_ATTEMPTS):
+            try:
+                async with limiter:
+                    return await post(**kwargs)
+            except TooManyRequests as e:
+                if attempt == POST_MAX_ATTEMPTS - 1:
+                    raise
+
+                delay = 2**attempt
+                if e.rate_limit_reset:
+                    delay = max(delay, e.rate_limit_reset - time.time())
+                logging.info(f"Rate limited, retrying in {delay:.1f} seconds")
+                await asyncio.sleep(delay)
+
+    async def create_tweet(self, **kwargs):
+        """Post a tweet through twikit, respecting the tweet rate limit"""
+        return await self._rate_limited(
+            self.tweet_limiter, self.client.create_tweet, **kwargs
+        )
+
+    async def send_dm(self, **kwargs):
+        """Send a DM through twikit, respecting the DM rate limit"""
+        return await self._rate_limited(self.dm_limiter, self.client.send_dm, **kwargs)
+
     async def send_hello_world(self):
         """Post 'Hakuna Matata' tweet"""
         try:
-            await self.client.create_tweet(text="I'm using Python!!")
+            await self.create_tweet(text="I'm using Python!!")
             logging.info("Successfully posted Hello World tweet!")
             print("Tweet posted successfully!")
         except Exception as e:
             logging.error(f"Error posting tweet: {str(e)}")
             print(f"Error posting tweet: {str(e)}")
 
+    def save_state(self, key, value):
+        """Persist one piece of bot state"""
+        with self.state_db:
+            self.state_db.execute(
+                "INSERT OR REPLACE INTO bot_state (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+
+    def save_replied_mentions(self):
+        """Persist the replied mention filter, if it changed since the last save"""
+        if self.unsaved_replies:
+            self.save_state("replied_mentions", self.replied_mentions.dumps())
+            self.unsaved_replies = 0
+
+    async def generate_text(self, kind, prompt):
+        """Generate a Gemini response, reusing a cached one for a repeated prompt"""
+        model = self.models[kind]
+        if kind in UNCACHED_KINDS:
+            return (await model.generate_content_async(prompt)).text
+
+        key = LLMCache.key(f"{model.model_name}:{kind}", prompt)
+        text = self.cache.get(key)
+        if text is None:
+            # The native async call keeps the event loop free while Gemini works
+            text = (await model.generate_content_async(prompt)).text
+            self.cache.set(key, text)
+        return text
+
+    async def stream_text(self, kind, prompt):
+        """Yield a Gemini response in chunks as it is generated, or whole when a
+        repeated prompt is cached"""
+        model = self.models[kind]
+        cacheable = kind not in UNCACHED_KINDS
+        key = LLMCache.key(f"{model.model_name}:{kind}", prompt)
+        text = self.cache.get(key) if cacheable else None
+        if text is not None:
+            yield text
+            return
+
+        chunks = []
+        async for chunk in await model.generate_content_async(prompt, stream=True):
+            chunks.append(chunk.text)
+            yield chunk.text
+        if cacheable:
+            self.cache.set(key, "".join(chunks))
+
     async def get_ai_response(self, tweet_text, author):
         """Generate AI response using Gemini"""
         try:
-            prompt = f"""
-            You are a friendly Twitter bot. Someone just mentioned you in a tweet.
-            Tweet: {tweet_text}
-            Author: @{author}
-            
-            Write a friendly, engaging response in less than 280 characters. 
-            Include their @username at the start.
-            Be helpful but concise.
-            """
-
-            response = self.model.generate_content(prompt)
-            return response.text
+            prompt = f"Tweet: {tweet_text}\nAuthor: @{author}"
+            return await self.generate_text("mention", prompt)
 
         except Exception as e:
             logging.error(f"Error generating AI response: {str(e)}")
@@ -99,36 +504,56 @@ class SimpleTwitterBot:
 
     async def check_mentions(self):
         """Check and respond to mentions using official Twitter API"""
-        try:
-            # Get mentions timeline
-            mentions = self.twitter_api.mentions_timeline(
-                since_id=self.last_mention_id, tweet_mode="extended"
-            )
-
-            for mention in mentions:
-                # Update last mention ID
-                if self.last_mention_id is None or mention.id > self.last_mention_id:
-                    self.last_mention_id = mention.id
-
-                # Get tweet text and author
-                tweet_text = mention.full_text
-                author = mention.user.screen_name
+        # Workers overlap one mention's Gemini call with another's reply post
+        queue = asyncio.Queue(maxsize=MENTION_QUEUE_SIZE)
+
+        async def produce():
+            try:
+                # Get mentions timeline
+                mentions = await asyncio.to_thread(
+                    self.twitter_api.mentions_timeline,
+                    since_id=self.last_mention_id,
+                    tweet_mode="extended",
+                )
+                for mention in mentions:
+                    if mention.id not in self.replied_mentions:
+                        await queue.put(mention)
+            except Exception as e:
+                logging.error(f"Error checking mentions: {str(e)}")
+                print(f"Error checking mentions: {str(e)}")
+            finally:
+                for _ in range(MENTION_WORKERS):
+                    await queue.put(None)
+
+        async def work():
+            while (mention := await queue.get()) is not None:
+                try:
+                    await self.reply_to_mention(mention)
+                except Exception as e:
+                    logging.error(f"Error replying to mention: {str(e)}")
 
-                # Get AI-generated response
-                response = await self.get_ai_response(tweet_text, author)
+        await asyncio.gather(produce(), *(work() for _ in range(MENTION_WORKERS)))
 
-                # Reply using twikit
-                await self.client.create_tweet(text=response, reply_to=mention.id)
+    async def reply_to_mention(self, mention):
+        """Generate and post a reply to one mention"""
+        # Get tweet text and author
+        author = mention.user.screen_name
+        response = await self.get_ai_response(mention.full_text, author)
 
-                logging.info(f"Replied to mention from @{author}")
-                print(f"Replied to mention from @{author}")
+        # Reply using twikit
+        await self.create_tweet(text=response, reply_to=mention.id)
+        self.replied_mentions.add(mention.id)
+        self.unsaved_replies += 1
+        if self.unsaved_replies >= REPLIED_FILTER_SAVE_EVERY:
+            self.save_replied_mentions()
 
-                # Avoid rate limits
-                await asyncio.sleep(2)
+        logging.info(f"Replied to mention from @{author}")
+        print(f"Replied to mention from @{author}")
 
-        except Exception as e:
-            logging.error(f"Error checking mentions: {str(e)}")
-            print(f"Error checking mentions: {str(e)}")
+        # Update last mention ID
+        if self.last_mention_id is None or mention.id > self.last_mention_id:
+            self.last_mention_id = mention.id
+            self.save_state("last_mention_id", str(mention.id))
 
     async def run_mention_monitor(self, check_interval=60):
         """Continuously monitor mentions"""
@@ -161,48 +586,56 @@ class SimpleTwitterBot:
             print(f"Error getting trending topics: {str(e)}")
             return []
 
-    async def get_topic_thread(self, topic):
-        """Generate an informative thread about a trending topic using Gemini"""
+    def get_topic_thread(self, topic):
+        """Generate an informative thread about a trending topic using Gemini,
+        as a stream of tweets that fills in while Gemini writes them"""
+        # Concurrent requests for the same topic share one in-flight generation;
+        # the background task also keeps one consumer's cancellation from
+        # stopping it for the others
+        stream = self.inflight_threads.get(topic)
+        if stream is None:
+            stream = TweetStream(self._generate_topic_thread(topic))
+            self.inflight_threads[topic] = stream
+            stream.task.add_done_callback(
+                lambda _: self.inflight_threads.pop(topic, None)
+            )
+        return stream
+
+    async def _generate_topic_thread(self, topic):
+        yielded = False
         try:
-            prompt = f"""
-            Create a short, engaging Twitter thread (3-4 tweets) about this trending topic: {topic}
-            
-            Requirements:
-            - Each tweet must be under 280 characters
-            - Make it informative and engaging
-            - Include relevant context and why it's trending
-            - Separate tweets with [TWEET]
-            - Don't use hashtags unless they're part of the trend name
-            - Be factual and objective
-            
-            Format your response as tweet-sized chunks separated by [TWEET].
-            """
-
-            response = self.model.generate_content(prompt)
-            # Split the response into individual tweets
-            tweets = response.text.split("[TWEET]")
-            # Clean up tweets (remove empty strings and strip whitespace)
-            tweets = [tweet.strip() for tweet in tweets if tweet.strip()]
-            return tweets
+            prompt = f"Trending topic: {topic}"
+            # Split the response into individual tweets as it streams in; a
+            # [TWEET] separator may straddle chunks, so only text before the
+            # last complete one is final
+            buffer = ""
+            async for chunk in self.stream_text("thread", prompt):
+                buffer += chunk
+                *complete, buffer = buffer.split("[TWEET]")
+                # Clean up tweets (remove empty strings and strip whitespace)
+                for tweet in complete:
+                    if tweet.strip():
+                        yielded = True
+                        yield tweet.strip()
+            if buffer.strip():
+                yield buffer.strip()
 
         except Exception as e:
             logging.error(f"Error generating thread content: {str(e)}")
-            return [f"🔥 Trending: {topic}", "Stay tuned for updates!"]
+            if not yielded:
+                yield f"🔥 Trending: {topic}"
+                yield "Stay tuned for updates!"
 
     async def post_thread(self, tweets):
-        """Post a thread of tweets"""
+        """Post a thread of tweets as they become available"""
         try:
             previous_tweet_id = None
-            for tweet in tweets:
-                if previous_tweet_id:
-                    response = await self.client.create_tweet(
-                        text=tweet, reply_to=previous_tweet_id
-                    )
-                else:
-                    response = await self.client.create_tweet(text=tweet)
+            async for tweet in tweets:
+                # Tweets only wait when the rate limit budget is used up
+                response = await self.create_tweet(
+                    text=tweet, reply_to=previous_tweet_id
+                )
                 previous_tweet_id = response.id
-                # Small delay to prevent rate limiting
-                await asyncio.sleep(2)
             return True
         except Exception as e:
             logging.error(f"Error posting thread: {str(e)}")
@@ -213,29 +646,30 @@ class SimpleTwitterBot:
         try:
             trends = await self.get_trending_topics()
             if trends:
-                # Take top 3 trending topics
-                for trend in trends[:3]:
-                    # Generate thread content
-                    thread_tweets = await self.get_topic_thread(trend["name"])
+                # Generate threads for the top 3 trending topics concurrently;
+                # each is posted tweet by tweet while Gemini is still writing
+                # the rest, and tweets within a thread reply to each other in
+                # order
+                threads = [
+                    (trend["name"], self.get_topic_thread(trend["name"]))
+                    for trend in trends[:3]
+                ]
+                for topic, thread_tweets in threads:
 
                     # Post the thread
                     success = await self.post_thread(thread_tweets)
 
                     if success:
-                        logging.info(
-                            f"Successfully posted thread about {trend['name']}"
-                        )
-                        print(f"Thread posted about: {trend['name']}")
-
-                    # Wait between threads to prevent rate limiting
-                    await asyncio.sleep(30)
+                        logging.info(f"Successfully posted thread about {topic}")
+                        print(f"Thread posted about: {topic}")
 
         except Exception as e:
             logging.error(f"Error posting trending topics: {str(e)}")
             print(f"Error posting trending topics: {str(e)}")
 
     async def check_dms(self):
-        """Check and respond to DMs using twikit"""
+        """Check and respond to DMs using twikit, returning how many were answered"""
+        replied = 0
         try:
             # Get your user ID first
             my_user_id = await self.client.user_id()
@@ -244,60 +678,82 @@ class SimpleTwitterBot:
             # Get DM history
             dm_history = await self.client.get_dm_history(user_id=sender_id)
 
-            for message in dm_history:
-                try:
+            # First check for this sender: start from the newest message
+            # rather than answering the whole history
+            if sender_id not in self.dm_cursors:
+                self.dm_cursors[sender_id] = max(
+                    (int(message.id) for message in dm_history), default=0
+                )
+                self.save_state("dm_cursors", json.dumps(self.dm_cursors))
+                return replied
+
+            # Only answer the sender's messages newer than the last one answered,
+            # oldest first
+            cursor = self.dm_cursors[sender_id]
+            new_messages = sorted(
+                (
+                    message
+                    for message in dm_history
+                    if int(message.id) > cursor and message.sender_id != my_user_id
+                ),
+                key=lambda message: int(message.id),
+            )
 
-                    # Get message text and sender
-                    message_text = message.text
-                    # sender = message.sender.screen_name
+            # Generate replies concurrently, a few at a time
+            semaphore = asyncio.Semaphore(DM_WORKERS)
 
-                    # Generate AI response
-                    response = await self.get_ai_response_dm(
-                        message_text=message_text, sender=sender_id
+            async def respond(message):
+                async with semaphore:
+                    return await self.get_ai_response_dm(
+                        message_text=message.text, sender=sender_id
                     )
 
-                    # Send DM reply
-                    await self.client.send_dm(user_id=sender_id, text=response)
-
-                    logging.info(f"Replied to DM from @{sender_id}")
-                    print(f"Replied to DM from @{sender_id}")
-
-                    # Avoid rate limits
-                    await asyncio.sleep(2)
+            responses = await asyncio.gather(
+                *(respond(message) for message in new_messages)
+            )
 
+            for message, response in zip(new_messages, responses):
+                try:
+                    # Send DM reply
+                    await self.send_dm(user_id=sender_id, text=response)
                 except Exception as e:
+                    # Stop here so the cursor doesn't move past an unanswered
+                    # message; the next check retries from it
                     logging.error(f"Error processing individual message: {str(e)}")
-                    continue
+                    break
+
+                self.dm_cursors[sender_id] = int(message.id)
+                self.save_state("dm_cursors", json.dumps(self.dm_cursors))
+
+                logging.info(f"Replied to DM from @{sender_id}")
+                print(f"Replied to DM from @{sender_id}")
+                replied += 1
 
         except Exception as e:
             logging.error(f"Error checking DMs: {str(e)}")
             print(f"Error checking DMs: {str(e)}")
 
+        return replied
+
     async def get_ai_response_dm(self, message_text, sender):
         """Generate AI response for DMs using Gemini"""
         try:
-            prompt = f"""
-            You are a friendly Twitter bot responding to a direct message.
-            Message: {message_text}
-            Sender: @{sender}
-            
-            Write a helpful and friendly response.
-            Be more detailed than in public tweets since DMs have no character limit.
-            Keep the tone conversational and engaging.
-            """
-
-            response = self.model.generate_content(prompt)
-            return response.text
+            prompt = f"Message: {message_text}\nSender: @{sender}"
+            return await self.generate_text("dm", prompt)
 
         except Exception as e:
             logging.error(f"Error generating DM response: {str(e)}")
             return f"Hi @{sender}! Thanks for your message. I'm experiencing some technical difficulties right now, but I'll get back to you soon!"
 
     async def run_dm_monitor(self, check_interval=60):
-        """Continuously monitor DMs"""
+        """Continuously monitor DMs, polling less often while none arrive"""
+        interval = check_interval
         while True:
-            await self.check_dms()
-            await asyncio.sleep(check_interval)  # Wait for specified interval
+            if await self.check_dms():
+                interval = check_interval
+            else:
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+            await asyncio.sleep(interval)  # Wait for the current interval
 
 
 async def main():
@@ -325,7 +781,12 @@ async def main():
         await bot.run_dm_monitor()
     except Exception as e:
         print(f"Error during execution: {str(e)}")
+    finally:
+        bot.save_replied_mentions()
+        await close_twikit_client()
 
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(main())